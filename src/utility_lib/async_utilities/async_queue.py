@@ -10,31 +10,269 @@ Returns
     TODO right now calls can fail with no evidence. Might just be consumed by pytest?
 """
 import asyncio
-import copy
 import csv
-import json
+import heapq
+import inspect
+import itertools
+import math
 import random
+import signal
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Optional, Sequence, Type, Any
+from time import monotonic, perf_counter_ns
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
 from abc import ABC, abstractmethod
 
 import aiohttp
 
+from utility_lib.async_utilities.body_codecs import (
+    ACCEPT_ENCODING,
+    dumps_json,
+    loads_json,
+)
+from utility_lib.async_utilities.coalesce import RequestCoalescer, share_response
+from utility_lib.async_utilities.concurrency import AdaptiveConcurrency
+from utility_lib.async_utilities.http_cache import (
+    CacheEntry,
+    CachedResponse,
+    HttpCache,
+    cache_key,
+)
+from utility_lib.async_utilities.http_limits import (
+    HostConcurrencyLimiter,
+    RateLimiter,
+    url_host,
+)
+from utility_lib.async_utilities.instrumentation import RunnerInstrument
+from utility_lib.async_utilities.journal import RunJournal
+from utility_lib.async_utilities.outcomes import ActionOutcome, OutcomeStatus
+from utility_lib.async_utilities.retry import RetryPolicy, RetryScheduler
 
-async def basic_worker(queue):
+# Statuses that mean the server is overloaded or throttling us, worth a retry.
+RETRY_STATUSES = (420, 429, 503, 504)
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class RunnerContext:
+    """
+    Shared helpers a queue runner hands to its workers.
+
+    Parameters
+    ----------
+    on_outcome : Optional[Callable[[ActionOutcome], Awaitable[None]]], optional
+        Awaited with the outcome of every finished action, by default None
+    instruments : List[RunnerInstrument], optional
+        Hooks called as actions start, finish and retry, by default []
+    queue : Optional[asyncio.Queue], optional
+        The runner's action queue, by default None
+    concurrency : Optional[AdaptiveConcurrency], optional
+        Limits how many actions run at once, by default None, one per worker.
+    executor : Optional[Executor], optional
+        Pool for CPU heavy work, by default None, the loop's default executor.
+    action_timeout : Optional[float], optional
+        Seconds an action may run before it is cancelled and counted as
+        failed, by default None (no limit)
+    """
+
+    on_outcome: Optional[Callable[[ActionOutcome], Awaitable[None]]] = None
+    instruments: List[RunnerInstrument] = field(default_factory=list)
+    queue: Optional[asyncio.Queue] = None
+    concurrency: Optional[AdaptiveConcurrency] = None
+    executor: Optional[Executor] = None
+    action_timeout: Optional[float] = None
+    running: Dict[asyncio.Task, Any] = field(default_factory=dict, repr=False)
+
+    async def open(self):
+        """Set up shared resources, called before the workers start."""
+
+    async def close(self):
+        """Release shared resources, called after the workers stop."""
+
+    async def abandon(self) -> List[Any]:
+        """
+        Drop actions held outside the queue, called when a run is stopped.
+
+        Returns
+        -------
+        List[Any]
+            The dropped actions.
+        """
+        return []
+
+    async def join(self, queue: asyncio.Queue):
+        """Wait until all actions on `queue` are done."""
+        await queue.join()
+
+    async def run_in_executor(self, func: Callable[..., Any], *args) -> Any:
+        """Run `func(*args)` in `executor`, off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def queue_depth(self) -> int:
+        if self.queue is None:
+            return 0
+        return self.queue.qsize()
+
+    @asynccontextmanager
+    async def action_slot(self):
+        """Wait until another action may run, and hold the slot while it runs."""
+        async with AsyncExitStack() as stack:
+            if self.concurrency is not None:
+                await stack.enter_async_context(self.concurrency)
+            yield
+
+    def action_started(self, action):
+        for instrument in self.instruments:
+            instrument.on_action_start(action, self.queue_depth())
+
+    async def report(self, outcome: ActionOutcome):
+        if outcome.status is OutcomeStatus.RETRYING:
+            for instrument in self.instruments:
+                instrument.on_retry(outcome, self.queue_depth())
+            return
+        for instrument in self.instruments:
+            instrument.on_action_finish(outcome, self.queue_depth())
+        if self.on_outcome is not None:
+            await self.on_outcome(outcome)
+
+
+async def run_action(action, do_action: Awaitable, runner_context: RunnerContext):
+    """
+    Await `do_action`, the `do_action` coroutine of `action`, and report its
+    outcome to `runner_context`.
+
+    If `do_action` returns an `ActionOutcome` it is reported as is, any other
+    return value is reported as the result of a successful action, and an
+    exception as a failed action. If the action's deadline has passed, it is
+    reported as expired without being run.
+    """
+    if is_expired(action):
+        do_action.close()
+        await runner_context.report(
+            ActionOutcome(
+                action,
+                OutcomeStatus.EXPIRED,
+                attempts=getattr(action, "retry_count", 0),
+            )
+        )
+        return
+    if runner_context.action_timeout is not None:
+        do_action = asyncio.wait_for(do_action, runner_context.action_timeout)
+    # keyed by worker, as the same action may be queued, and run, twice.
+    worker = asyncio.current_task()
+    runner_context.running[worker] = action
+    try:
+        async with runner_context.action_slot():
+            runner_context.action_started(action)
+            start = perf_counter_ns()
+            try:
+                result = await do_action
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                outcome = ActionOutcome(action, OutcomeStatus.FAILED, error=exc)
+            else:
+                if isinstance(result, ActionOutcome):
+                    outcome = result
+                else:
+                    outcome = ActionOutcome(
+                        action, OutcomeStatus.SUCCESS, result=result
+                    )
+            outcome.latency = (perf_counter_ns() - start) / 1_000_000_000
+    finally:
+        del runner_context.running[worker]
+    await runner_context.report(outcome)
+
+
+def is_expired(action, now: Optional[float] = None) -> bool:
+    """Whether the `deadline` of `action`, if it has one, has passed."""
+    deadline = getattr(action, "deadline", None)
+    if deadline is None:
+        return False
+    if now is None:
+        now = monotonic()
+    return deadline <= now
+
+
+def make_deadline(timeout: float) -> float:
+    """A deadline `timeout` seconds from now, for an action's `deadline`."""
+    return monotonic() + timeout
+
+
+def takes_runner_context(worker: Callable, positional: int) -> bool:
+    """
+    Whether `worker` takes a `runner_context` after its `positional` arguments,
+    so workers written before runner contexts can still be called without one.
+
+    It does if it has a `runner_context` parameter, `*args`, or more required
+    positional parameters than `positional`. Optional ones, as in
+    `worker(queue, verbose=False)`, are left to their defaults.
+    """
+    try:
+        parameters = inspect.signature(worker).parameters.values()
+    except (TypeError, ValueError):
+        return True
+    count = 0
+    for parameter in parameters:
+        if parameter.kind is inspect.Parameter.VAR_POSITIONAL:
+            return True
+        if parameter.name == "runner_context":
+            return True
+        if parameter.default is not inspect.Parameter.empty:
+            continue
+        if parameter.kind in (
+            inspect.Parameter.POSITIONAL_ONLY,
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        ):
+            count += 1
+    return count > positional
+
+
+async def basic_worker(queue, runner_context=None):
+    if runner_context is None:
+        runner_context = RunnerContext()
     while True:
         job = await queue.get()
-        await job.do_action(queue)
+        await run_action(job, job.do_action(queue), runner_context)
         queue.task_done()
 
 
 class QueueAction(ABC):
-    def __init__(self, name, context=None):
+    def __init__(
+        self,
+        name,
+        context=None,
+        priority: int = 0,
+        deadline: Optional[float] = None,
+    ):
         self.name: str = name
         if not context:
             self.context = {}
         else:
             self.context = context
+        # lower runs first, with a `PriorityFeedQueue`.
+        self.priority = priority
+        # `time.monotonic()` time the action expires, see `make_deadline`.
+        self.deadline = deadline
+
+    def journal_key(self) -> str:
+        """Identifies the action in a `RunJournal`."""
+        return f"{type(self).__name__}:{self.name}"
 
     @abstractmethod
     async def do_action(self, queue):
@@ -55,56 +293,980 @@ class ExampleAction(QueueAction):
         self.context["result"] = f"{self.name} Action Completed. Slept for {sleep_for}"
 
 
+class PoolAction(QueueAction):
+    """
+    A `QueueAction` with a CPU heavy stage that runs in a worker pool.
+
+    `do_action` awaits `prepare` on the event loop, runs `compute` on what it
+    returns in the runner's executor, then awaits `finish` with the result.
+    Run by a `PoolQueueRunner`, `compute` runs in another process, so it must
+    be a static method, and its argument and result must pickle. Run by any
+    other runner, `compute` runs on the event loop.
+    """
+
+    async def prepare(self, queue) -> Any:
+        """The argument for `compute`, by default `context["data"]`."""
+        _ = queue
+        return self.context.get("data", None)
+
+    @staticmethod
+    @abstractmethod
+    def compute(data: Any) -> Any:
+        raise NotImplementedError
+
+    async def finish(self, result: Any, queue):
+        """Handle the result of `compute`, by default stored as `context["result"]`."""
+        _ = queue
+        self.context["result"] = result
+
+    async def do_action(self, queue, runner_context=None):
+        data = await self.prepare(queue)
+        if runner_context is None:
+            result = self.compute(data)
+        else:
+            result = await runner_context.run_in_executor(self.compute, data)
+        await self.finish(result, queue)
+        return result
+
+
+class FeedQueue(asyncio.Queue):
+    """
+    An unbounded queue whose `feed_limit` only applies to `feed`.
+
+    A producer using `feed` waits until the queue drains below `feed_limit`,
+    so actions are pulled from their source only as workers free up slots.
+    Actions put back on the queue by workers (retries, extra pages) never
+    block, so a worker can't deadlock against a full queue.
+
+    Parameters
+    ----------
+    feed_limit : int, optional
+        Maximum queue size before `feed` waits, by default 0 (no limit)
+    on_put : Optional[Callable[[Any], None]], optional
+        Called with every item put on the queue, by default None
+    """
+
+    def __init__(
+        self, feed_limit: int = 0, on_put: Optional[Callable[[Any], None]] = None
+    ):
+        super().__init__()
+        self.feed_limit = feed_limit
+        self.on_put = on_put
+        self._slot_freed = asyncio.Event()
+
+    def put_nowait(self, item):
+        super().put_nowait(item)
+        if self.on_put is not None:
+            self.on_put(item)
+
+    def _get(self):
+        self._slot_freed.set()
+        return super()._get()
+
+    async def wait_for_slot(self):
+        while self.feed_limit > 0 and self.qsize() >= self.feed_limit:
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+
+    async def feed(self, item):
+        await self.wait_for_slot()
+        self.put_nowait(item)
+
+
+class PriorityFeedQueue(FeedQueue):
+    """
+    A `FeedQueue` that hands out actions by their `priority`, lowest first,
+    then earliest `deadline`.
+
+    Among actions with the same priority and deadline, actions put back on the
+    queue by workers (retries, extra pages) go before actions fed from the
+    source, so they don't wait behind the whole backlog. Ties are first in,
+    first out. Actions without `priority` or `deadline` attributes count as
+    priority 0 with no deadline.
+
+    Parameters
+    ----------
+    feed_limit : int, optional
+        Maximum queue size before `feed` waits, by default 0 (no limit)
+    on_put : Optional[Callable[[Any], None]], optional
+        Called with every item put on the queue, by default None
+    """
+
+    def _init(self, maxsize):
+        self._queue = []
+        self._order = itertools.count()
+        self._feeding = False
+
+    def _put(self, item):
+        deadline = getattr(item, "deadline", None)
+        if deadline is None:
+            deadline = math.inf
+        key = (getattr(item, "priority", 0), deadline, self._feeding)
+        heapq.heappush(self._queue, (key, next(self._order), item))
+
+    def _get(self):
+        self._slot_freed.set()
+        return heapq.heappop(self._queue)[-1]
+
+    async def feed(self, item):
+        await self.wait_for_slot()
+        self._feeding = True
+        try:
+            self.put_nowait(item)
+        finally:
+            self._feeding = False
+
+
+async def feed_queue(
+    queue: FeedQueue, actions: Union[Iterable[Any], AsyncIterable[Any]]
+):
+    """
+    Feed actions from a sync or async iterable into a `FeedQueue`.
+
+    Parameters
+    ----------
+    queue : FeedQueue
+        The queue to feed.
+    actions : Union[Iterable[Any], AsyncIterable[Any]]
+        Source of actions, consumed lazily.
+    """
+    if hasattr(actions, "__aiter__"):
+        async for action in actions:  # type: ignore
+            await queue.feed(action)
+    else:
+        for action in actions:  # type: ignore
+            await queue.feed(action)
+
+
+async def stop_workers(task_workers):
+    for task in task_workers:
+        task.cancel()
+    await asyncio.gather(*task_workers, return_exceptions=True)
+
+
+def drain_queue(queue: asyncio.Queue) -> List[Any]:
+    """Take every item left on `queue`."""
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+        queue.task_done()
+    return items
+
+
 class QueueRunner:
-    def __init__(self, worker=None):
+    """
+    Runs `QueueAction`s through a pool of workers.
+
+    Parameters
+    ----------
+    worker : optional
+        Worker coroutine, called as `worker(queue, runner_context)`, or
+        `worker(queue)` if it doesn't take a runner context, by default
+        `basic_worker`
+    instruments : Optional[Sequence[RunnerInstrument]], optional
+        Hooks called as runs and actions start and finish, e.g. a
+        `MetricsCollector`, by default None
+    concurrency : Optional[AdaptiveConcurrency], optional
+        Adapts how many of the workers run actions at once to the latency
+        and errors seen, by default None, all workers run.
+    prioritise : bool, optional
+        Run actions by `priority` and `deadline` with a `PriorityFeedQueue`,
+        rather than first in, first out, by default False
+    journal : Optional[RunJournal], optional
+        Records queued and finished actions, so a run of the same job after a
+        crash skips finished actions and queues pending ones again,
+        by default None
+    action_timeout : Optional[float], optional
+        Seconds an action may run before it is cancelled and counted as
+        failed, by default None (no limit)
+
+    Attributes
+    ----------
+    unfinished : List[Any]
+        After a run that was stopped or timed out, the actions that were
+        queued, running or waiting to retry. With a `journal`, they are also
+        still pending in the journal.
+    """
+
+    def __init__(
+        self,
+        worker=None,
+        instruments: Optional[Sequence[RunnerInstrument]] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        prioritise: bool = False,
+        journal: Optional[RunJournal] = None,
+        action_timeout: Optional[float] = None,
+    ):
         if worker is None:
             self.worker = basic_worker
         else:
             self.worker = worker
+        if instruments is None:
+            self.instruments: List[RunnerInstrument] = []
+        else:
+            self.instruments = list(instruments)
+        self.concurrency = concurrency
+        if concurrency is not None:
+            self.instruments.append(concurrency)
+        self.prioritise = prioritise
+        self.journal = journal
+        if journal is not None:
+            self.instruments.append(journal)
+        self.action_timeout = action_timeout
         self.queue = None
+        self.unfinished: List[Any] = []
+        self._stop_feeding: Optional[asyncio.Event] = None
+        self._abort: Optional[asyncio.Event] = None
+
+    def make_queue(self, maxsize: int) -> FeedQueue:
+        on_put = None
+        if self.journal is not None:
+            on_put = self.journal.record_pending
+        if self.prioritise:
+            return PriorityFeedQueue(feed_limit=maxsize, on_put=on_put)
+        return FeedQueue(feed_limit=maxsize, on_put=on_put)
+
+    def make_runner_context(self) -> RunnerContext:
+        return RunnerContext(instruments=self.instruments)
+
+    def start_worker(self, runner_context: RunnerContext):
+        if takes_runner_context(self.worker, 1):
+            return self.worker(self.queue, runner_context)
+        return self.worker(self.queue)
+
+    def stop(self, drain: bool = True):
+        """
+        Stop the running queue early.
+
+        Parameters
+        ----------
+        drain : bool, optional
+            Stop taking actions from the source, but finish the actions
+            already queued, by default True. If False, cancel the running
+            actions and return now, leaving the rest in `unfinished`.
+        """
+        if self._stop_feeding is None or self._abort is None:
+            return
+        self._stop_feeding.set()
+        if not drain:
+            self._abort.set()
+
+    def on_signal(self, signal_number: int):
+        if self._stop_feeding is not None and self._stop_feeding.is_set():
+            print(f"\nReceived {signal.Signals(signal_number).name}, stopping now.")
+            self.stop(drain=False)
+        else:
+            print(
+                f"\nReceived {signal.Signals(signal_number).name}, finishing queued"
+                " actions. Send again to stop now."
+            )
+            self.stop()
+
+    @contextmanager
+    def signal_handlers(self, handle_signals: bool):
+        """Call `on_signal` on SIGINT and SIGTERM, where the loop supports it."""
+        loop = asyncio.get_running_loop()
+        installed = []
+        if handle_signals:
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(
+                        signal_number, self.on_signal, signal_number
+                    )
+                except (NotImplementedError, RuntimeError, ValueError):
+                    continue
+                installed.append(signal_number)
+        try:
+            yield
+        finally:
+            for signal_number in installed:
+                loop.remove_signal_handler(signal_number)
+
+    async def feed_and_join(
+        self,
+        runner_context: RunnerContext,
+        actions: Union[Iterable[Any], AsyncIterable[Any]],
+    ):
+        """Feed actions until told to stop, then wait for the queue to finish."""
+        feeding = asyncio.create_task(feed_queue(self.queue, actions))
+        stop_feeding = asyncio.create_task(self._stop_feeding.wait())  # type: ignore
+        try:
+            await asyncio.wait(
+                {feeding, stop_feeding}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if feeding.done():
+                feeding.result()
+        finally:
+            feeding.cancel()
+            stop_feeding.cancel()
+            await asyncio.gather(feeding, stop_feeding, return_exceptions=True)
+        await runner_context.join(self.queue)
+
+    async def run_queue(
+        self,
+        actions: Union[Iterable[Any], AsyncIterable[Any]],
+        workers: int,
+        maxsize: int = 0,
+        on_outcome: Optional[Callable[[ActionOutcome], Awaitable[None]]] = None,
+        timeout: Optional[float] = None,
+        handle_signals: bool = False,
+    ):
+        """
+        Run actions through a pool of workers, handing each outcome to
+        `on_outcome` as soon as the action is done.
+
+        See `do_queue` for parameters.
+        """
+        runner_context = self.make_runner_context()
+        runner_context.on_outcome = on_outcome
+        runner_context.concurrency = self.concurrency
+        runner_context.action_timeout = self.action_timeout
+        self.unfinished = []
+        self._stop_feeding = asyncio.Event()
+        self._abort = asyncio.Event()
+        await runner_context.open()
+        try:
+            self.queue = self.make_queue(maxsize)
+            runner_context.queue = self.queue
+            for instrument in self.instruments:
+                instrument.on_run_start(workers)
+            task_workers = []
+            for _ in range(workers):
+                task = asyncio.create_task(self.start_worker(runner_context))
+                task_workers.append(task)
+            if self.journal is not None:
+                actions = self.journal.resume(actions)
+            work = asyncio.create_task(self.feed_and_join(runner_context, actions))
+            abort = asyncio.create_task(self._abort.wait())
+            try:
+                with self.signal_handlers(handle_signals):
+                    done, _ = await asyncio.wait(
+                        {work, abort},
+                        timeout=timeout,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                if work in done:
+                    work.result()
+                elif not done:
+                    print(f"\nQueue timed out after {timeout} seconds.")
+            finally:
+                work.cancel()
+                abort.cancel()
+                await asyncio.gather(work, abort, return_exceptions=True)
+                self.unfinished.extend(runner_context.running.values())
+                await stop_workers(task_workers)
+                self.unfinished.extend(drain_queue(self.queue))
+                self.unfinished.extend(await runner_context.abandon())
+                for instrument in self.instruments:
+                    instrument.on_run_finish()
+        finally:
+            await runner_context.close()
+
+    async def do_queue(
+        self,
+        actions: Union[Iterable[QueueAction], AsyncIterable[QueueAction]],
+        workers: int,
+        maxsize: int = 0,
+        timeout: Optional[float] = None,
+        handle_signals: bool = False,
+    ) -> List[ActionOutcome]:
+        """
+        Run actions through a pool of workers, returning when all are done.
+
+        Parameters
+        ----------
+        actions : Union[Iterable[QueueAction], AsyncIterable[QueueAction]]
+            The actions to run. Can be a lazy (async) iterable.
+        workers : int
+            Number of workers. With `concurrency` set, the most actions that
+            may run at once.
+        maxsize : int, optional
+            If greater than 0, actions are pulled from `actions` only while
+            fewer than `maxsize` are waiting on the queue, keeping memory flat
+            for very large jobs, by default 0 (queue everything at once)
+        timeout : Optional[float], optional
+            Seconds before the run is stopped, running actions cancelled and
+            the rest left in `unfinished`, by default None (no limit)
+        handle_signals : bool, optional
+            On SIGINT or SIGTERM, stop taking new actions and finish the queued
+            ones, on a second signal stop now, by default False
+
+        Returns
+        -------
+        List[ActionOutcome]
+            The outcome of every action, in the order they finished. Use
+            `iter_queue` to handle outcomes while the queue is running.
+        """
+        outcomes: List[ActionOutcome] = []
+
+        async def collect(outcome: ActionOutcome):
+            outcomes.append(outcome)
+
+        await self.run_queue(
+            actions, workers, maxsize, collect, timeout, handle_signals
+        )
+        return outcomes
+
+    async def iter_queue(
+        self,
+        actions: Union[Iterable[QueueAction], AsyncIterable[QueueAction]],
+        workers: int,
+        maxsize: int = 0,
+        timeout: Optional[float] = None,
+        handle_signals: bool = False,
+    ) -> AsyncIterator[ActionOutcome]:
+        """
+        Run actions through a pool of workers, yielding each outcome as soon as
+        the action is done.
 
-    async def do_queue(self, actions: Sequence[Type[QueueAction]], workers: int):
-        self.queue = asyncio.Queue()
-        task_workers = []
-        for _ in range(workers):
-            task = asyncio.create_task(self.worker(self.queue))
-            task_workers.append(task)
-        for action in actions:
-            self.queue.put_nowait(action)
-        await self.queue.join()
-        for task in task_workers:
-            task.cancel()
-        await asyncio.gather(*task_workers, return_exceptions=True)
-
-
-async def http_worker(queue, session):
+        If outcomes aren't consumed, workers wait once `workers` outcomes are
+        pending. Closing the generator early, with `aclose`, cancels the
+        remaining actions.
+
+        See `do_queue` for parameters.
+        """
+        outcomes: asyncio.Queue = asyncio.Queue(maxsize=max(workers, 1))
+        finished = object()
+
+        async def run():
+            cancelled = False
+            try:
+                await self.run_queue(
+                    actions, workers, maxsize, outcomes.put, timeout, handle_signals
+                )
+            except asyncio.CancelledError:
+                # nobody is waiting for outcomes any more.
+                cancelled = True
+                raise
+            finally:
+                if not cancelled:
+                    await outcomes.put(finished)
+
+        run_task = asyncio.create_task(run())
+        try:
+            while True:
+                outcome = await outcomes.get()
+                if outcome is finished:
+                    break
+                yield outcome
+            await run_task
+        finally:
+            if not run_task.done():
+                run_task.cancel()
+                await asyncio.gather(run_task, return_exceptions=True)
+
+
+@dataclass
+class PoolRunnerContext(RunnerContext):
+    """
+    Shared helpers a `PoolQueueRunner` hands to its workers.
+
+    Parameters
+    ----------
+    pool_size : Optional[int], optional
+        Size of the pool opened by `open`, by default None, one per CPU.
+    use_processes : bool, optional
+        Open a process pool rather than a thread pool, by default True
+    """
+
+    pool_size: Optional[int] = None
+    use_processes: bool = True
+    _owns_executor: bool = field(default=False, init=False, repr=False)
+
+    async def open(self):
+        if self.executor is None:
+            if self.use_processes:
+                self.executor = ProcessPoolExecutor(max_workers=self.pool_size)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.pool_size)
+            self._owns_executor = True
+
+    async def close(self):
+        if self._owns_executor and self.executor is not None:
+            executor = self.executor
+            self.executor = None
+            self._owns_executor = False
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, executor.shutdown)
+
+
+async def pool_worker(queue, runner_context=None):
+    if runner_context is None:
+        runner_context = RunnerContext()
     while True:
         job = await queue.get()
-        await job.do_action(queue=queue, session=session)
+        if isinstance(job, PoolAction):
+            do_action = job.do_action(queue, runner_context)
+        else:
+            do_action = job.do_action(queue)
+        await run_action(job, do_action, runner_context)
         queue.task_done()
 
 
-class HttpQueueRunner:
-    def __init__(self, worker=None):
+class PoolQueueRunner(QueueRunner):
+    """
+    Runs `QueueAction`s through a pool of workers, with the `compute` stage of
+    every `PoolAction` in a process (or thread) pool, so CPU heavy work is
+    spread over several cores while I/O stays on the event loop.
+
+    Use at least as many workers as `pool_size` to keep the pool busy.
+
+    Parameters
+    ----------
+    worker : optional
+        Worker coroutine, called as `worker(queue, runner_context)`, or
+        `worker(queue)` if it doesn't take a runner context, by default
+        `pool_worker`
+    pool_size : Optional[int], optional
+        Processes (or threads) in the pool, by default None, one per CPU.
+    use_processes : bool, optional
+        Use a `ProcessPoolExecutor`, or a `ThreadPoolExecutor` for work that
+        releases the GIL, by default True
+    instruments : Optional[Sequence[RunnerInstrument]], optional
+        Hooks called as runs and actions start and finish, by default None
+    concurrency : Optional[AdaptiveConcurrency], optional
+        Adapts how many actions run at once, by default None
+    prioritise : bool, optional
+        Run actions by `priority` and `deadline`, by default False
+    journal : Optional[RunJournal], optional
+        Records queued and finished actions so a job can resume,
+        by default None
+    action_timeout : Optional[float], optional
+        Seconds an action may run before it is cancelled and counted as
+        failed, by default None (no limit)
+    """
+
+    def __init__(
+        self,
+        worker=None,
+        pool_size: Optional[int] = None,
+        use_processes: bool = True,
+        instruments: Optional[Sequence[RunnerInstrument]] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        prioritise: bool = False,
+        journal: Optional[RunJournal] = None,
+        action_timeout: Optional[float] = None,
+    ):
         if worker is None:
-            self.worker = http_worker
+            worker = pool_worker
+        super().__init__(
+            worker, instruments, concurrency, prioritise, journal, action_timeout
+        )
+        self.pool_size = pool_size
+        self.use_processes = use_processes
+
+    def make_runner_context(self) -> PoolRunnerContext:
+        return PoolRunnerContext(
+            instruments=self.instruments,
+            pool_size=self.pool_size,
+            use_processes=self.use_processes,
+        )
+
+
+@dataclass
+class ConnectorConfig:
+    """
+    Settings for the `aiohttp.TCPConnector` shared by a `HttpQueueRunner`.
+
+    Defaults match aiohttp's own defaults.
+
+    Parameters
+    ----------
+    limit : int, optional
+        Total simultaneous connections, 0 for no limit, by default 100
+    limit_per_host : int, optional
+        Simultaneous connections to one host, 0 for no limit, by default 0
+    keepalive_timeout : float, optional
+        Seconds an idle connection is kept for reuse, by default 15
+    ttl_dns_cache : Optional[int], optional
+        Seconds DNS lookups are cached, None to cache forever, by default 10
+    use_dns_cache : bool, optional
+        Cache DNS lookups, by default True
+    """
+
+    limit: int = 100
+    limit_per_host: int = 0
+    keepalive_timeout: float = 15
+    ttl_dns_cache: Optional[int] = 10
+    use_dns_cache: bool = True
+
+    def make_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.ttl_dns_cache,
+            use_dns_cache=self.use_dns_cache,
+        )
+
+
+class SessionPool:
+    """
+    A set of `aiohttp.ClientSession`s, each with its own connector and cookie
+    jar, to spread many workers over several connection pools.
+
+    Workers are given the `shards` sessions in turn. With `per_host`, each
+    request instead uses a session for its host, opened on first use.
+
+    A pool can be reused by several runs on the same event loop, and is closed
+    by whoever opened it. Each session has its own `connector_config.limit`,
+    so the total connection limit is multiplied by the number of sessions.
+
+    Parameters
+    ----------
+    shards : int, optional
+        Sessions opened by `open`, by default 1
+    per_host : bool, optional
+        Use one session per host, by default False
+    connector_config : Optional[ConnectorConfig], optional
+        Connection pool settings for each session, by default `ConnectorConfig()`
+    """
+
+    def __init__(
+        self,
+        shards: int = 1,
+        per_host: bool = False,
+        connector_config: Optional[ConnectorConfig] = None,
+    ):
+        if shards < 1:
+            raise ValueError("A SessionPool needs at least one shard.")
+        self.shards = shards
+        self.per_host = per_host
+        if connector_config is None:
+            self.connector_config = ConnectorConfig()
         else:
-            self.worker = worker
-        self.queue = None
+            self.connector_config = connector_config
+        self.sessions: List[aiohttp.ClientSession] = []
+        self.host_sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
 
-    async def do_queue(self, actions: Sequence[Type["HttpAction"]], workers: int):
-        async with aiohttp.ClientSession() as session:
-            self.queue = asyncio.Queue()
-            task_workers = []
-            for _ in range(workers):
-                task = asyncio.create_task(self.worker(self.queue, session))
-                task_workers.append(task)
-            for action in actions:
-                self.queue.put_nowait(action)
-            await self.queue.join()
-            for task in task_workers:
-                task.cancel()
-            await asyncio.gather(*task_workers, return_exceptions=True)
+    def make_session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(connector=self.connector_config.make_connector())
+
+    async def open(self):
+        """Open the sessions, unless they are already open on this loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self.sessions:
+            return
+        # sessions from a loop that has gone can't be closed from this one.
+        self.host_sessions = {}
+        self.sessions = [self.make_session() for _ in range(self.shards)]
+        self._loop = loop
+
+    def session(self, index: int = 0, url: Optional[str] = None):
+        """The session for worker `index`, or for requests to `url`."""
+        if self.per_host and url is not None:
+            host = url_host(url)
+            if host not in self.host_sessions:
+                self.host_sessions[host] = self.make_session()
+            return self.host_sessions[host]
+        return self.sessions[index % len(self.sessions)]
+
+    async def close(self):
+        sessions = self.sessions + list(self.host_sessions.values())
+        self.sessions = []
+        self.host_sessions = {}
+        self._loop = None
+        for session in sessions:
+            await session.close()
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+
+@dataclass
+class HttpRunnerContext(RunnerContext):
+    """
+    Shared helpers a `HttpQueueRunner` hands to every `HttpAction` it runs.
+
+    Parameters
+    ----------
+    session : Optional[aiohttp.ClientSession], optional
+        Session for all requests, by default None, taken from `session_pool`.
+    session_pool : Optional[SessionPool], optional
+        Sessions for the workers, by default None, a single session pool
+        opened by `open` and closed by `close`.
+    close_session_pool : bool, optional
+        Close `session_pool` in `close`, by default False
+    connector_config : Optional[ConnectorConfig], optional
+        Connection pool settings for the session pool opened by `open`,
+        by default `ConnectorConfig()`
+    host_limiter : Optional[HostConcurrencyLimiter], optional
+        Caps concurrent requests per host, by default None
+    rate_limiter : Optional[RateLimiter], optional
+        Paces requests, by default None
+    retry_scheduler : Optional[RetryScheduler], optional
+        Delays retries, by default None, retries are queued immediately.
+    http_cache : Optional[HttpCache], optional
+        Conditional request cache, by default None
+    coalescer : Optional[RequestCoalescer], optional
+        Shares responses between identical GET requests in flight,
+        by default None
+    request_timeout : Optional[float], optional
+        Seconds a request may take, after which it is retried like a dropped
+        connection, by default None (aiohttp's default)
+    accept_encoding : Optional[str], optional
+        Accept-Encoding header for requests that don't set their own,
+        by default None (aiohttp's default)
+    """
+
+    session: Optional[aiohttp.ClientSession] = None
+    session_pool: Optional[SessionPool] = None
+    close_session_pool: bool = False
+    connector_config: Optional[ConnectorConfig] = None
+    host_limiter: Optional[HostConcurrencyLimiter] = None
+    rate_limiter: Optional[RateLimiter] = None
+    retry_scheduler: Optional[RetryScheduler] = None
+    http_cache: Optional[HttpCache] = None
+    coalescer: Optional[RequestCoalescer] = None
+    request_timeout: Optional[float] = None
+    accept_encoding: Optional[str] = None
+    _workers_started: int = field(default=0, init=False, repr=False)
+
+    async def open(self):
+        if self.session is not None:
+            return
+        if self.session_pool is None:
+            self.session_pool = SessionPool(connector_config=self.connector_config)
+            self.close_session_pool = True
+        await self.session_pool.open()
+        self.session = self.session_pool.session()
+
+    def worker_session(self) -> aiohttp.ClientSession:
+        """The session for the next worker, taking the pool's shards in turn."""
+        if self.session_pool is None:
+            return self.session  # type: ignore
+        session = self.session_pool.session(self._workers_started)
+        self._workers_started += 1
+        return session
+
+    def session_for(
+        self, url: str, session: aiohttp.ClientSession
+    ) -> aiohttp.ClientSession:
+        """The session for a request to `url`, `session` unless it is per host."""
+        if self.session_pool is not None and self.session_pool.per_host:
+            return self.session_pool.session(url=url)
+        return session
+
+    async def abandon(self) -> List[Any]:
+        if self.retry_scheduler is None:
+            return []
+        return await self.retry_scheduler.cancel()
+
+    async def close(self):
+        if self.retry_scheduler is not None:
+            await self.retry_scheduler.cancel()
+        if self.close_session_pool and self.session_pool is not None:
+            await self.session_pool.close()
+            self.session_pool = None
+            self.session = None
+            self.close_session_pool = False
+
+    @asynccontextmanager
+    async def request_slot(self, url: str):
+        """Wait until a request to `url` is allowed, and hold it while in flight."""
+        async with AsyncExitStack() as stack:
+            if self.host_limiter is not None:
+                await stack.enter_async_context(self.host_limiter.limit(url))
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(url)
+            yield
+
+    def observe_response(self, url: str, response: aiohttp.ClientResponse):
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(url, response.status, response.headers)
+
+    async def retry(self, queue: asyncio.Queue, action: "HttpAction"):
+        if self.retry_scheduler is None:
+            await queue.put(action)
+        else:
+            self.retry_scheduler.schedule(queue, action, action.retry_count)
+
+    async def join(self, queue: asyncio.Queue):
+        """Wait until `queue` is done, including any retries still backing off."""
+        if self.retry_scheduler is None:
+            await queue.join()
+        else:
+            await self.retry_scheduler.join(queue)
+
+
+async def http_worker(queue, session, runner_context=None):
+    if runner_context is None:
+        runner_context = HttpRunnerContext(session=session)
+    while True:
+        job = await queue.get()
+        await run_action(
+            job,
+            job.do_action(queue=queue, session=session, runner_context=runner_context),
+            runner_context,
+        )
+        queue.task_done()
+
+
+class HttpQueueRunner(QueueRunner):
+    """
+    Runs `HttpAction`s through a pool of workers sharing one session, or
+    spread over several sessions with `sessions` or `per_host_sessions`.
+
+    The sessions are opened and closed by each run, unless the runner is
+    used as an async context manager or given a `session_pool`, in which case
+    they are reused by every run until closed:
+
+        async with HttpQueueRunner(sessions=4) as runner:
+            await runner.do_queue(first_actions, 32)
+            await runner.do_queue(second_actions, 32)
+
+    Parameters
+    ----------
+    worker : optional
+        Worker coroutine, called as `worker(queue, session, runner_context)`,
+        or `worker(queue, session)` if it doesn't take a runner context,
+        by default `http_worker`
+    connector_config : Optional[ConnectorConfig], optional
+        Connection pool settings, by default `ConnectorConfig()`
+    max_requests_per_host : int, optional
+        If greater than 0, the most requests in flight to any one host,
+        regardless of the number of workers, by default 0
+    rate_limiter : Optional[RateLimiter], optional
+        Paces requests across all workers, e.g. a `HostRateLimiter`,
+        by default None
+    retry_policy : Optional[RetryPolicy], optional
+        Back off for failed requests, by default `RetryPolicy()`
+    http_cache : Optional[HttpCache], optional
+        Cache GET responses on disk and revalidate them with conditional
+        requests, by default None
+    instruments : Optional[Sequence[RunnerInstrument]], optional
+        Hooks called as runs and actions start and finish, e.g. a
+        `MetricsCollector`, by default None
+    concurrency : Optional[AdaptiveConcurrency], optional
+        Adapts how many of the workers send requests at once to the latency
+        and errors seen, by default None, all workers send requests.
+    prioritise : bool, optional
+        Run actions by `priority` and `deadline` with a `PriorityFeedQueue`,
+        so retries and extra pages go before the backlog, by default False
+    coalesce_requests : bool, optional
+        While a GET request is in flight, identical actions wait for its
+        response instead of making their own request, by default False
+    journal : Optional[RunJournal], optional
+        Records queued and finished actions, so a run of the same job after a
+        crash skips finished requests and queues pending ones again, including
+        extra pages, by default None
+    request_timeout : Optional[float], optional
+        Seconds a request may take, after which it is retried like a dropped
+        connection, by default None (aiohttp's default, 5 minutes)
+    action_timeout : Optional[float], optional
+        Seconds an action, including its response handlers, may run before it
+        is cancelled and counted as failed, by default None (no limit)
+    accept_encoding : Optional[str], optional
+        Compressed encodings to ask for, by default `ACCEPT_ENCODING`, gzip
+        and deflate, plus brotli if a brotli package is installed. None
+        leaves aiohttp's default.
+    sessions : int, optional
+        Sessions the workers are spread over, each with its own connection
+        pool of `connector_config.limit` connections, by default 1
+    per_host_sessions : bool, optional
+        Send requests to each host with a session of its own, by default False
+    session_pool : Optional[SessionPool], optional
+        Sessions to use instead of `sessions` and `per_host_sessions`, opened
+        and closed by the caller and reused across runs, by default None
+    """
+
+    def __init__(
+        self,
+        worker=None,
+        connector_config: Optional[ConnectorConfig] = None,
+        max_requests_per_host: int = 0,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        http_cache: Optional[HttpCache] = None,
+        instruments: Optional[Sequence[RunnerInstrument]] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        prioritise: bool = False,
+        coalesce_requests: bool = False,
+        journal: Optional[RunJournal] = None,
+        request_timeout: Optional[float] = None,
+        action_timeout: Optional[float] = None,
+        accept_encoding: Optional[str] = ACCEPT_ENCODING,
+        sessions: int = 1,
+        per_host_sessions: bool = False,
+        session_pool: Optional[SessionPool] = None,
+    ):
+        if worker is None:
+            worker = http_worker
+        super().__init__(
+            worker, instruments, concurrency, prioritise, journal, action_timeout
+        )
+        if connector_config is None:
+            self.connector_config = ConnectorConfig()
+        else:
+            self.connector_config = connector_config
+        self.max_requests_per_host = max_requests_per_host
+        self.rate_limiter = rate_limiter
+        if retry_policy is None:
+            self.retry_policy = RetryPolicy()
+        else:
+            self.retry_policy = retry_policy
+        self.http_cache = http_cache
+        self.coalesce_requests = coalesce_requests
+        self.request_timeout = request_timeout
+        self.accept_encoding = accept_encoding
+        self.sessions = sessions
+        self.per_host_sessions = per_host_sessions
+        self.session_pool = session_pool
+        self._owns_session_pool = False
+
+    def make_session_pool(self) -> SessionPool:
+        return SessionPool(
+            self.sessions, self.per_host_sessions, self.connector_config
+        )
+
+    async def __aenter__(self):
+        if self.session_pool is None:
+            self.session_pool = self.make_session_pool()
+            self._owns_session_pool = True
+        await self.session_pool.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        if self._owns_session_pool:
+            await self.session_pool.close()  # type: ignore
+            self.session_pool = None
+            self._owns_session_pool = False
+
+    def make_runner_context(self) -> HttpRunnerContext:
+        session_pool = self.session_pool
+        close_session_pool = False
+        if session_pool is None:
+            session_pool = self.make_session_pool()
+            close_session_pool = True
+        runner_context = HttpRunnerContext(
+            instruments=self.instruments,
+            session_pool=session_pool,
+            close_session_pool=close_session_pool,
+            connector_config=self.connector_config,
+            rate_limiter=self.rate_limiter,
+            retry_scheduler=RetryScheduler(self.retry_policy),
+            http_cache=self.http_cache,
+            request_timeout=self.request_timeout,
+            accept_encoding=self.accept_encoding,
+        )
+        if self.max_requests_per_host > 0:
+            runner_context.host_limiter = HostConcurrencyLimiter(
+                self.max_requests_per_host
+            )
+        if self.coalesce_requests:
+            runner_context.coalescer = RequestCoalescer()
+        return runner_context
+
+    def start_worker(self, runner_context: HttpRunnerContext):  # type: ignore
+        session = runner_context.worker_session()
+        if takes_runner_context(self.worker, 2):
+            return self.worker(self.queue, session, runner_context)
+        return self.worker(self.queue, session)
 
 
 class HttpAction:
@@ -119,6 +1281,8 @@ class HttpAction:
         response_handlers=None,
         internal_params: dict = None,
         context: dict = None,
+        priority: int = 0,
+        deadline: Optional[float] = None,
     ):
         self.method = method
         self.url = url
@@ -144,41 +1308,265 @@ class HttpAction:
             self.context = context
         # self.response_text = None
         self.retry_count = 0
+        self.priority = priority
+        self.deadline = deadline
+
+    async def do_action(
+        self,
+        queue,
+        session: aiohttp.ClientSession,
+        runner_context: Optional[HttpRunnerContext] = None,
+    ) -> ActionOutcome:
+        """
+        Make the request, and hand a successful response to the response handlers.
 
-    async def do_action(self, queue, session: aiohttp.ClientSession):
+        Returns
+        -------
+        ActionOutcome
+            SUCCESS with the last value returned by a response handler,
+            RETRYING if the action was put back on the queue, or FAILED.
+            Connection errors are only retried if they happen before the
+            response handlers are called.
+        """
         if self.retry_count >= self.retry_limit:
-            return
+            return self.outcome(OutcomeStatus.FAILED)
         self.retry_count += 1
+        if runner_context is None:
+            runner_context = HttpRunnerContext(session=session)
+        http_cache = runner_context.http_cache
+        coalescer = runner_context.coalescer
+        if self.method.upper() != "GET":
+            http_cache = None
+            coalescer = None
+        coalesce_key = None
+        handling = False
         try:
-            async with session.request(
+            cache_entry = None
+            if http_cache is not None:
+                cache_entry = await http_cache.lookup(self.cache_key())
+            if cache_entry is not None and cache_entry.is_fresh():
+                handling = True
+                result = await self.handle_response(cache_entry.to_response(), queue)
+                return self.outcome(
+                    OutcomeStatus.SUCCESS, result=result, http_status=cache_entry.status
+                )
+            if coalescer is not None:
+                shared_response = await coalescer.follow_or_lead(self.coalesce_key())
+                if shared_response is not None:
+                    handling = True
+                    result = await self.handle_response(shared_response, queue)
+                    return self.outcome(
+                        OutcomeStatus.SUCCESS,
+                        result=result,
+                        http_status=shared_response.status,
+                    )
+                coalesce_key = self.coalesce_key()
+            session = runner_context.session_for(self.url, session)
+            async with runner_context.request_slot(self.url), session.request(
                 self.method,
                 self.url,
                 params=self.request_params,
-                **self.internal_params,
+                **self.request_kwargs(
+                    cache_entry,
+                    runner_context.request_timeout,
+                    runner_context.accept_encoding,
+                ),
             ) as response:
+                runner_context.observe_response(self.url, response)
                 # response_text = await response.text()
-                if response.status == 200:
+                if response.status == 200 or (
+                    response.status == 304 and cache_entry is not None
+                ):
                     # if self.store_response_text:
                     #     self.response_text = response_text
-                    for response_handler in self.response_handlers:
-                        await response_handler(
-                            action=self, response=response, queue=queue
+                    if http_cache is not None:
+                        handled_response = await self.update_cache(
+                            http_cache, cache_entry, response
                         )
-                else:
-                    await self.handle_network_error(response, queue)
-
-        except Exception as exc:
-            # FIXME fix this
+                    else:
+                        handled_response = response
+                    if coalesce_key is not None:
+                        handled_response = await self.share_with_followers(
+                            coalescer, coalesce_key, handled_response
+                        )
+                        # finished, so the key may already have a new leader.
+                        coalesce_key = None
+                    handling = True
+                    result = await self.handle_response(handled_response, queue)
+                    return self.outcome(
+                        OutcomeStatus.SUCCESS,
+                        result=result,
+                        http_status=response.status,
+                        bytes_received=response.content.total_bytes,
+                    )
+                retrying = await self.handle_network_error(
+                    response, queue, runner_context
+                )
+                return self.outcome(
+                    OutcomeStatus.RETRYING if retrying else OutcomeStatus.FAILED,
+                    http_status=response.status,
+                    bytes_received=response.content.total_bytes,
+                )
+        except (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError,
+        ) as exc:
+            # connection failed or dropped mid response, worth a retry unless
+            # the handlers had started, they may have queued pages or saved
+            # files already.
+            print(f"\nConnection Error: {exc!r}\n URL: {self.url}")
+            if handling:
+                return self.outcome(OutcomeStatus.FAILED, error=exc)
+            retrying = await self.retry(queue, runner_context)
+            return self.outcome(
+                OutcomeStatus.RETRYING if retrying else OutcomeStatus.FAILED, error=exc
+            )
+        except Exception as exc:  # pylint: disable=broad-except
             print(exc)
+            return self.outcome(OutcomeStatus.FAILED, error=exc)
+        finally:
+            if coalesce_key is not None:
+                # nothing to share, a follower will make the request instead.
+                coalescer.finish(coalesce_key)
+
+    def outcome(self, status: OutcomeStatus, **kwargs) -> ActionOutcome:
+        return ActionOutcome(self, status, attempts=self.retry_count, **kwargs)
+
+    def cache_key(self) -> str:
+        return cache_key(self.method, self.url, self.request_params)
+
+    def journal_key(self) -> str:
+        """Identifies the request in a `RunJournal`."""
+        return self.coalesce_key()
+
+    def coalesce_key(self) -> str:
+        """Identical requests, including `internal_params`, share this key."""
+        return cache_key(
+            self.method, self.url, self.request_params, self.internal_params
+        )
+
+    async def share_with_followers(
+        self, coalescer: RequestCoalescer, coalesce_key: str, response
+    ):
+        """
+        Hand a successful response to identical actions waiting for it.
+
+        Returns
+        -------
+        Union[CachedResponse, aiohttp.ClientResponse]
+            The response for this action's handlers, read into memory if it
+            was shared.
+        """
+        if not coalescer.has_followers(coalesce_key):
+            coalescer.finish(coalesce_key)
+            return response
+        if not isinstance(response, CachedResponse):
+            response = await share_response(response)
+        coalescer.finish(coalesce_key, response)
+        return response
 
-    async def handle_network_error(self, response, queue):
+    def request_kwargs(
+        self,
+        cache_entry: Optional[CacheEntry] = None,
+        request_timeout: Optional[float] = None,
+        accept_encoding: Optional[str] = None,
+    ) -> dict:
+        """
+        Keyword args for `session.request`, `internal_params` plus any
+        conditional headers needed to revalidate `cache_entry`, and a timeout
+        of `request_timeout` seconds and an Accept-Encoding header unless
+        `internal_params` has its own.
+        """
+        request_kwargs = dict(self.internal_params)
+        headers = dict(self.internal_params.get("headers", {}))
+        if cache_entry is not None:
+            headers.update(cache_entry.conditional_headers())
+        if accept_encoding is not None and "accept-encoding" not in {
+            name.lower() for name in headers
+        }:
+            headers["Accept-Encoding"] = accept_encoding
+        if headers:
+            request_kwargs["headers"] = headers
+        if request_timeout is not None and "timeout" not in request_kwargs:
+            request_kwargs["timeout"] = aiohttp.ClientTimeout(total=request_timeout)
+        return request_kwargs
+
+    async def update_cache(
+        self,
+        http_cache: HttpCache,
+        cache_entry: Optional[CacheEntry],
+        response: aiohttp.ClientResponse,
+    ):
+        """
+        Store or refresh the cache entry for a 200 or 304 response.
+
+        Returns
+        -------
+        Union[CachedResponse, aiohttp.ClientResponse]
+            The cached copy to hand to response handlers, or `response` itself
+            if it can't be cached.
+        """
+        if response.status == 304 and cache_entry is not None:
+            cache_entry = await http_cache.refresh(cache_entry, response.headers)
+            return cache_entry.to_response()
+        if not http_cache.is_cacheable(response.headers):
+            return response
+        cache_entry = await http_cache.store(
+            self.cache_key(),
+            response.url,
+            response.status,
+            response.headers,
+            await response.read(),
+        )
+        return cache_entry.to_response()
+
+    async def handle_response(self, response, queue) -> Any:
+        """
+        Call the response handlers in order.
+
+        Returns
+        -------
+        Any
+            The last value other than None returned by a handler, the result
+            of the action.
+        """
+        result = None
+        for response_handler in self.response_handlers:
+            handler_result = await response_handler(
+                action=self, response=response, queue=queue
+            )
+            if handler_result is not None:
+                result = handler_result
+        return result
+
+    async def handle_network_error(
+        self, response, queue, runner_context=None
+    ) -> bool:
         # retry for server time out errors
         print(
             f"\nError Status: {response.status}\n Response Text:{await response.text()}\n URL: {response.url}\n Internal Params: {self.internal_params} "
         )
-        if response.status in (503, 504):
-            if self.retry_on_fail:
-                await queue.put(self)
+        if response.status in RETRY_STATUSES:
+            return await self.retry(queue, runner_context)
+        return False
+
+    async def retry(self, queue, runner_context=None) -> bool:
+        """
+        Put this action back on the queue, if retries are allowed and left.
+
+        Returns
+        -------
+        bool
+            True if the action will be retried.
+        """
+        if not self.retry_on_fail or self.retry_count >= self.retry_limit:
+            return False
+        if runner_context is None:
+            await queue.put(self)
+        else:
+            await runner_context.retry(queue, self)
+        return True
 
 
 async def print_response(action, response, queue):
@@ -193,58 +1581,181 @@ async def print_page_number(
     print(f"\npage {page} of {page_limit}")
 
 
-async def save_response(action, response, queue):
+async def get_save_path(action, response, queue) -> Optional[Path]:
+    """
+    The save path for a response, from context["save_path_provider"] if
+    given, otherwise context["save_path"].
+    """
     save_path = action.context.get("save_path", None)
     save_path_provider = action.context.get("save_path_provider", None)
     if save_path_provider is not None:
         save_path = await save_path_provider(action, response, queue)
-    save_data = await response.text()
+    if save_path is None:
+        return None
+    return Path(save_path)
+
+
+async def persist(
+    action, save_func: Callable[[Any, Path], bool], save_data: Any, save_path: Path
+):
+    """
+    Save data without blocking the event loop.
+
+    Saves are handed to the `FileWriter` in context["file_writer"] if there
+    is one, without waiting for the write to finish. Otherwise they run in
+    the default executor.
+
+    Parameters
+    ----------
+    action : [type]
+        The action whose context is checked for a file writer.
+    save_func : Callable[[Any, Path], bool]
+        Blocking save function, e.g. `save_string`
+    save_data : Any
+        Data to save.
+    save_path : Path
+        Path to saved file.
+    """
+    file_writer = action.context.get("file_writer", None)
+    if file_writer is None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, save_func, save_data, save_path)
+    else:
+        await file_writer.submit(save_func, save_data, save_path)
+
+
+async def save_response(action, response, queue):
+    """Save the body as received, without decoding it."""
+    save_path = await get_save_path(action, response, queue)
+    save_data = await response.read()
     if save_path is not None and save_data:
-        save_path = Path(save_path)
-        save_string(save_data, save_path)
+        await persist(action, save_bytes, save_data, save_path)
+
+
+async def stream_response_to_file(
+    action: HttpAction, response: aiohttp.ClientResponse, queue: asyncio.Queue
+):
+    """
+    Stream the response body to the save path, one chunk at a time.
+
+    The body is never held in memory as a whole, and file operations run in
+    the default executor so they don't stall other requests. Chunks are
+    written to a ".part" file which replaces the save path once the whole
+    body has arrived. The chunk size can be set in context["chunk_size"].
+
+    Parameters
+    ----------
+    action : HttpAction
+        Uses context["save_path"] or context["save_path_provider"].
+    response : aiohttp.ClientResponse
+        The response to save.
+    queue : asyncio.Queue
+        The action queue.
+    """
+    save_path = await get_save_path(action, response, queue)
+    if save_path is None:
+        return
+    chunk_size = action.context.get("chunk_size", DEFAULT_CHUNK_SIZE)
+    part_path = save_path.with_name(save_path.name + ".part")
+    loop = asyncio.get_running_loop()
+    out_file = await loop.run_in_executor(None, open_part_file, part_path)
+    try:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            await loop.run_in_executor(None, out_file.write, chunk)
+    except BaseException:
+        await loop.run_in_executor(None, discard_part_file, out_file, part_path)
+        raise
+    await loop.run_in_executor(None, out_file.close)
+    await loop.run_in_executor(None, part_path.replace, save_path)
+
+
+def open_part_file(part_path: Path):
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    return part_path.open("wb")
+
+
+def discard_part_file(out_file, part_path: Path):
+    out_file.close()
+    if part_path.exists():
+        part_path.unlink()
 
 
 async def save_processed_response(
     action: HttpAction, response: aiohttp.ClientResponse, queue: asyncio.Queue
 ):
-    save_path = action.context.get("save_path", None)
-    save_path_provider = action.context.get("save_path_provider", None)
-    if save_path_provider is not None:
-        save_path = await save_path_provider(action, response, queue)
+    save_path = await get_save_path(action, response, queue)
     save_data = action.context.get("response_data", None)
     if save_path is not None and save_data:
-        save_path = Path(save_path)
-        save_string(save_data, save_path)
+        await persist(action, save_string, save_data, save_path)
 
 
 async def save_response_to_json(
     action: HttpAction, response: aiohttp.ClientResponse, queue: asyncio.Queue
 ):
-    save_path = action.context.get("save_path", None)
-    save_path_provider = action.context.get("save_path_provider", None)
-    if save_path_provider is not None:
-        save_path = await save_path_provider(action, response, queue)
-    save_data = json.dumps(await response.json(), indent=2)
+    save_path = await get_save_path(action, response, queue)
+    save_data = dumps_json(loads_json(await response.read()), indent=True)
     if save_path is not None and save_data:
-        save_path = Path(save_path)
-        save_string(save_data, save_path)
+        await persist(action, save_bytes, save_data, save_path)
 
 
 async def save_response_to_csv(
     action: HttpAction, response: aiohttp.ClientResponse, queue: asyncio.Queue
 ):
-    save_path = action.context.get("save_path", None)
-    save_path_provider = action.context.get("save_path_provider", None)
-    if save_path_provider is not None:
-        save_path = await save_path_provider(action, response, queue)
-    save_data = await response.json()
+    save_path = await get_save_path(action, response, queue)
+    save_data = loads_json(await response.read())
     if save_path is not None and save_data:
-        save_path = Path(save_path)
-        save_list_of_dicts(save_data, save_path)
+        await persist(action, save_list_of_dicts, save_data, save_path)
 
 
 async def process_response_to_json(action, response, queue):
-    action.context["response_data"] = await response.json()
+    """Parse the body as JSON, straight from bytes, into `context["response_data"]`."""
+    action.context["response_data"] = loads_json(await response.read())
+    return action.context["response_data"]
+
+
+async def process_response_to_bytes(action, response, queue):
+    """Keep the raw (decompressed) body as `context["response_bytes"]`."""
+    action.context["response_bytes"] = await response.read()
+    return action.context["response_bytes"]
+
+
+def make_page_action(
+    action: HttpAction, page: int, page_param: str = "page"
+) -> HttpAction:
+    """
+    A copy of `action` for another page.
+
+    `request_params` and `internal_params` are shallow copies, everything else
+    (handlers, context) is shared with `action`. The page keeps the priority
+    and deadline of `action`, so pages of an urgent request stay urgent.
+    """
+    request_params = dict(action.request_params)
+    request_params[page_param] = page
+    return HttpAction(
+        method=action.method,
+        url=action.url,
+        request_params=request_params,
+        response_handlers=action.response_handlers,
+        context=action.context,
+        retry_on_fail=action.retry_on_fail,
+        retry_limit=action.retry_limit,
+        internal_params=dict(action.internal_params),
+        priority=action.priority,
+        deadline=action.deadline,
+    )
+
+
+def put_all(queue: asyncio.Queue, actions: Iterable[Any]):
+    """
+    Put actions on an unbounded queue in one go.
+
+    Raises
+    ------
+    asyncio.QueueFull
+        If `queue` is bounded and fills up.
+    """
+    for action in actions:
+        queue.put_nowait(action)
 
 
 async def check_for_pages(action, response, queue):
@@ -254,22 +1765,92 @@ async def check_for_pages(action, response, queue):
         if page_range is not None:
             page_range = int(page_range)
             if page_range > 1:
-                for x in range(page_range):
-                    if x + 1 == 1:
-                        continue
-                    # new_action = copy.deepcopy(action)
-                    new_action = HttpAction(
-                        method=action.method,
-                        url=action.url,
-                        request_params=copy.deepcopy(action.request_params),
-                        response_handlers=action.response_handlers,
-                        context=action.context,
-                        retry_on_fail=action.retry_on_fail,
-                        retry_limit=action.retry_limit,
-                        internal_params=copy.deepcopy(action.internal_params),
-                    )
-                    new_action.request_params["page"] = x + 1
-                    await queue.put(new_action)
+                put_all(
+                    queue,
+                    (make_page_action(action, x) for x in range(2, page_range + 1)),
+                )
+
+
+class PaginationPlanner:
+    """
+    Fans out paginated requests, remembering page counts between runs.
+
+    `plan` returns the first page of a request, plus, if the page count for
+    the same request is known from an earlier run, actions for the remaining
+    pages, so they don't wait on the first page. Add `check_for_pages` to the
+    page actions' response handlers; when the first page returns it records
+    the page count and queues any pages not already planned.
+
+    If a speculative page is beyond the current page count, the server's
+    error for it is handled like any other failed request.
+
+    Parameters
+    ----------
+    page_counts : Optional[Dict[str, int]], optional
+        Known page counts from `page_counts` of an earlier planner, by default None
+    page_param : str, optional
+        Request param holding the page number, by default "page"
+    page_header : str, optional
+        Response header holding the page count, by default "x-pages"
+    speculative : bool, optional
+        Plan pages past the first from known page counts, by default True
+    """
+
+    def __init__(
+        self,
+        page_counts: Optional[Dict[str, int]] = None,
+        page_param: str = "page",
+        page_header: str = "x-pages",
+        speculative: bool = True,
+    ):
+        if page_counts is None:
+            self.page_counts: Dict[str, int] = {}
+        else:
+            self.page_counts = page_counts
+        self.page_param = page_param
+        self.page_header = page_header
+        self.speculative = speculative
+        self._planned: Dict[str, int] = {}
+
+    def page_key(self, action: HttpAction) -> str:
+        """Identifies the paginated request, regardless of page."""
+        request_params = dict(action.request_params)
+        request_params.pop(self.page_param, None)
+        return cache_key(action.method, action.url, request_params)
+
+    def plan(self, action: HttpAction) -> List[HttpAction]:
+        """
+        Actions for the first page of `action`, and for pages known from an
+        earlier run.
+        """
+        key = self.page_key(action)
+        first_page = make_page_action(action, 1, self.page_param)
+        page_count = 1
+        if self.speculative:
+            page_count = self.page_counts.get(key, 1)
+        self._planned[key] = page_count
+        return [first_page] + [
+            make_page_action(action, x, self.page_param)
+            for x in range(2, page_count + 1)
+        ]
+
+    async def check_for_pages(self, action, response, queue):
+        if action.request_params.get(self.page_param, None) != 1:
+            return
+        page_count = response.headers.get(self.page_header, None)
+        if page_count is None:
+            return
+        page_count = int(page_count)
+        key = self.page_key(action)
+        self.page_counts[key] = page_count
+        planned = self._planned.pop(key, 1)
+        put_all(
+            queue,
+            (
+                make_page_action(action, x, self.page_param)
+                for x in range(planned + 1, page_count + 1)
+            ),
+        )
 
 
 async def store_page_text(action, response, queue):
@@ -307,8 +1888,7 @@ def save_string(data: str, file_path: Path) -> bool:
         bool -- True if successful
     """
     try:
-        if not file_path.parent.exists():
-            file_path.parent.mkdir(parents=True)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
         with open(file_path, "w") as out_file:
             out_file.write(data)
     except Exception as e:
@@ -317,6 +1897,28 @@ def save_string(data: str, file_path: Path) -> bool:
     return True
 
 
+def save_bytes(data: bytes, file_path: Path) -> bool:
+    """Save bytes. Makes parent directories if they don't exist.
+
+    Traps all errors and prints them to std out.
+
+    Arguments:
+        data {bytes} -- The bytes to save
+        file_path {Path} -- Path to the saved file.
+
+    Returns:
+        bool -- True if successful
+    """
+    try:
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "wb") as out_file:
+            out_file.write(data)
+    except Exception as e:
+        print(e)
+        return False
+    return True
+
+
 def save_list_of_dicts(data: Sequence[Dict[str, Any]], file_path: Path) -> bool:
     """Save a list of dicts to csv.
     
@@ -328,8 +1930,7 @@ def save_list_of_dicts(data: Sequence[Dict[str, Any]], file_path: Path) -> bool:
         bool -- True if successful.
     """
     try:
-        if not file_path.parent.exists():
-            file_path.parent.mkdir(parents=True)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
         with open(file_path, "w", encoding="utf8", newline="") as out_file:
             writer = csv.DictWriter(out_file, fieldnames=data[0].keys())
             writer.writeheader()
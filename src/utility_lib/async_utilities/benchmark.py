@@ -0,0 +1,205 @@
+"""
+Load test `HttpQueueRunner` against the local `MockApi`.
+
+    python -m utility_lib.async_utilities.benchmark --workers 1 8 32 \\
+        --requests 2000 --latency 0.02 --error-rate 0.01
+
+Reports requests per second, latency percentiles and memory for each worker
+count. The mock API runs on the same event loop as the runner, so figures
+are for comparing runs on one machine, not absolute server capacity.
+"""
+import argparse
+import asyncio
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from utility_lib.async_utilities.async_queue import (
+    RETRY_STATUSES,
+    HttpAction,
+    HttpQueueRunner,
+)
+from utility_lib.async_utilities.instrumentation import MetricsCollector
+from utility_lib.async_utilities.mock_server import MockApi, MockApiConfig
+from utility_lib.async_utilities.retry import RetryPolicy
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore
+
+COLUMNS = (
+    ("workers", "workers", "{:d}"),
+    ("requests_per_second", "req/s", "{:.1f}"),
+    ("latency_p50", "p50 ms", "{:.2f}"),
+    ("latency_p95", "p95 ms", "{:.2f}"),
+    ("latency_p99", "p99 ms", "{:.2f}"),
+    ("retries", "retries", "{:d}"),
+    ("failed", "failed", "{:d}"),
+    ("peak_traced_kb", "peak kB", "{:.0f}"),
+    ("max_rss_kb", "rss kB", "{:.0f}"),
+)
+
+
+async def discard_response(action, response, queue):
+    """Read the body and drop it, so the benchmark measures the runner."""
+    await response.read()
+
+
+class BenchmarkAction(HttpAction):
+    """
+    An `HttpAction` that handles error statuses without printing them, so the
+    injected errors don't bury the results. The metrics count them instead.
+    """
+
+    async def handle_network_error(
+        self, response, queue, runner_context=None
+    ) -> bool:
+        if response.status in RETRY_STATUSES:
+            return await self.retry(queue, runner_context)
+        return False
+
+
+def benchmark_actions(url: str, requests: int, pages: int) -> Iterator[HttpAction]:
+    for count in range(requests):
+        yield BenchmarkAction(
+            "GET",
+            url,
+            request_params={"page": count % pages + 1},
+            response_handlers=[discard_response],
+        )
+
+
+def max_rss_kb() -> Optional[float]:
+    if resource is None:
+        return None
+    return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+async def benchmark_run(
+    workers: int,
+    requests: int,
+    config: Optional[MockApiConfig] = None,
+    trace_memory: bool = False,
+    **runner_kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Run `requests` requests against a fresh `MockApi` with `workers` workers.
+
+    Parameters
+    ----------
+    workers : int
+        Workers for the runner.
+    requests : int
+        Requests to make, cycling through the pages of the API.
+    config : Optional[MockApiConfig], optional
+        The mock API's behaviour, by default `MockApiConfig()`
+    trace_memory : bool, optional
+        Measure peak Python memory with `tracemalloc`, which slows the run,
+        by default False
+    runner_kwargs : Any
+        Passed to `HttpQueueRunner`, by default retries back off from 10ms.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The `MetricsCollector` summary, plus `workers`, `peak_traced_kb` and
+        `max_rss_kb`, None where not measured.
+    """
+    api = MockApi(config)
+    metrics = MetricsCollector()
+    runner_kwargs.setdefault("retry_policy", RetryPolicy(base_delay=0.01))
+    runner = HttpQueueRunner(instruments=[metrics], **runner_kwargs)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        async with api.serve() as url:
+            actions = benchmark_actions(url, requests, api.config.pages)
+            await runner.do_queue(actions, workers, maxsize=workers * 2)
+        peak_traced_kb = None
+        if trace_memory:
+            peak_traced_kb = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    summary = metrics.summary()
+    summary["workers"] = workers
+    summary["peak_traced_kb"] = peak_traced_kb
+    summary["max_rss_kb"] = max_rss_kb()
+    return summary
+
+
+def run_benchmarks(
+    worker_counts: Sequence[int],
+    requests: int,
+    config: Optional[MockApiConfig] = None,
+    trace_memory: bool = False,
+    **runner_kwargs: Any,
+) -> List[Dict[str, Any]]:
+    """`benchmark_run` for each worker count, each on a new event loop."""
+    return [
+        asyncio.run(
+            benchmark_run(workers, requests, config, trace_memory, **runner_kwargs)
+        )
+        for workers in worker_counts
+    ]
+
+
+def format_results(results: Sequence[Dict[str, Any]]) -> List[str]:
+    """The results as the lines of a table."""
+    rows = [[title for _, title, _ in COLUMNS]]
+    for result in results:
+        row = []
+        for name, _, value_format in COLUMNS:
+            value = result.get(name, None)
+            if value is None:
+                row.append("-")
+            elif name.startswith("latency"):
+                row.append(value_format.format(value * 1000))
+            else:
+                row.append(value_format.format(value))
+        rows.append(row)
+    widths = [max(len(row[x]) for row in rows) for x in range(len(COLUMNS))]
+    return [
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+        for row in rows
+    ]
+
+
+def parse_args(args: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--items-per-page", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="measure peak Python memory with tracemalloc, slows the run",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: Optional[Sequence[str]] = None):
+    options = parse_args(args)
+    config = MockApiConfig(
+        pages=options.pages,
+        items_per_page=options.items_per_page,
+        latency=options.latency,
+        latency_jitter=options.latency_jitter,
+        error_rate=options.error_rate,
+        error_limit=max(options.requests, 100),
+        seed=options.seed,
+    )
+    results = run_benchmarks(
+        options.workers, options.requests, config, options.trace_memory
+    )
+    for line in format_results(results):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Compact response body handling: content encoding negotiation, and JSON
+decoding straight from bytes, with `orjson` if it is installed.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    from aiohttp.compression_utils import HAS_BROTLI
+except ImportError:  # older aiohttp
+    try:
+        import brotli  # noqa: F401 pylint: disable=unused-import
+
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+
+def accept_encoding() -> str:
+    """
+    The encodings aiohttp can decode here, brotli only if a brotli package is
+    installed.
+    """
+    if HAS_BROTLI:
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+
+ACCEPT_ENCODING = accept_encoding()
+
+
+def loads_json(data: bytes) -> Any:
+    """Parse JSON from bytes, without decoding them to a str first."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_json(data: Any, indent: bool = False) -> bytes:
+    """Serialise to UTF-8 JSON bytes, indented by 2 spaces if `indent`."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode(
+        "utf8"
+    )
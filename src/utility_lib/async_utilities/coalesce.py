@@ -0,0 +1,73 @@
+"""
+In flight request coalescing for `HttpAction`s.
+
+While a request is in flight, identical requests wait for its response rather
+than making their own, and every waiting action's response handlers get a
+copy of the one response.
+"""
+import asyncio
+from typing import Dict, Optional
+
+import aiohttp
+
+from utility_lib.async_utilities.http_cache import TRANSFER_HEADERS, CachedResponse
+
+
+class RequestCoalescer:
+    """
+    Tracks requests in flight by key, so identical requests share a response.
+
+    The first caller of `follow_or_lead` for a key leads: it makes the request
+    and must call `finish` with the response to share, or None if it has
+    none. Later callers wait for the leader. If the leader has nothing to
+    share, e.g. it failed, one of the waiting callers takes over as leader.
+    """
+
+    def __init__(self):
+        self._leaders: Dict[str, asyncio.Future] = {}
+        self._followers: Dict[str, int] = {}
+
+    async def follow_or_lead(self, key: str) -> Optional[CachedResponse]:
+        """
+        Wait for the response of an identical request in flight.
+
+        Returns
+        -------
+        Optional[CachedResponse]
+            The shared response, or None if the caller now leads `key`.
+        """
+        while key in self._leaders:
+            leader = self._leaders[key]
+            self._followers[key] = self._followers.get(key, 0) + 1
+            try:
+                response = await asyncio.shield(leader)
+            finally:
+                self._followers[key] -= 1
+                if not self._followers[key]:
+                    del self._followers[key]
+            if response is not None:
+                return response
+        self._leaders[key] = asyncio.get_running_loop().create_future()
+        return None
+
+    def has_followers(self, key: str) -> bool:
+        return self._followers.get(key, 0) > 0
+
+    def finish(self, key: str, response: Optional[CachedResponse] = None):
+        """Hand `response` to the followers of `key`, and stop leading it."""
+        leader = self._leaders.pop(key, None)
+        if leader is not None and not leader.done():
+            leader.set_result(response)
+
+
+async def share_response(response: aiohttp.ClientResponse) -> CachedResponse:
+    """Read a response into a `CachedResponse` that can be handed out many times."""
+    body = await response.read()
+    headers = {
+        name: value
+        for name, value in response.headers.items()
+        if name.lower() not in TRANSFER_HEADERS
+    }
+    return CachedResponse(
+        str(response.url), response.status, headers, body, from_cache=False
+    )
@@ -0,0 +1,175 @@
+"""
+Adaptive concurrency for the async queue runners.
+
+An `AdaptiveConcurrency` limit lets a runner find how many actions to run at
+once: it grows by one while workers are waiting for a slot and latency and
+errors stay low, and shrinks by a factor when latency rises above the best
+seen or the server starts throttling (AIMD).
+"""
+import asyncio
+from collections import deque
+from typing import Any, Deque, List, Optional, Sequence
+
+from utility_lib.async_utilities.instrumentation import RunnerInstrument
+from utility_lib.async_utilities.outcomes import ActionOutcome, OutcomeStatus
+
+# Statuses that mean the server is overloaded or throttling us.
+OVERLOAD_STATUSES = (420, 429, 503, 504)
+
+
+class AdaptiveConcurrency(RunnerInstrument):
+    """
+    An AIMD concurrency limit, adjusted from the outcomes of the actions it
+    lets through.
+
+    The runner starts its full pool of `workers`, and each worker waits for a
+    slot before running an action, so `limit` is the number of actions in
+    flight. Every `window` attempts the limit is checked:
+
+    * if more than `error_threshold` of the attempts raised or got an
+      overload status, or the median latency is more than `latency_tolerance`
+      times the best median seen, the limit is multiplied by `backoff`.
+    * otherwise, if a worker had to wait for a slot, the limit goes up by one.
+
+    The limit stays between `min_limit` and `max_limit`, which defaults to the
+    runner's worker count.
+
+    Parameters
+    ----------
+    initial_limit : int, optional
+        Actions in flight at the start, by default 4
+    min_limit : int, optional
+        Lowest limit, by default 1
+    max_limit : Optional[int], optional
+        Highest limit, by default None, the number of workers.
+    window : int, optional
+        Attempts between adjustments, by default 20
+    backoff : float, optional
+        Factor applied to the limit on a decrease, by default 0.75
+    latency_tolerance : float, optional
+        Median latency, as a multiple of the best median seen, that counts as
+        overload, by default 2.0
+    error_threshold : float, optional
+        Share of failed attempts that counts as overload, by default 0.1
+    overload_statuses : Sequence[int], optional
+        HTTP statuses that count as errors, by default `OVERLOAD_STATUSES`
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        window: int = 20,
+        backoff: float = 0.75,
+        latency_tolerance: float = 2.0,
+        error_threshold: float = 0.1,
+        overload_statuses: Sequence[int] = OVERLOAD_STATUSES,
+    ):
+        if min_limit < 1:
+            raise ValueError("min_limit must be at least 1.")
+        self.initial_limit = max(initial_limit, min_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.window = window
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.overload_statuses = tuple(overload_statuses)
+        self.limit = self.initial_limit
+        self.limits: List[int] = [self.limit]
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self._upper_limit = max_limit
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._saturated = False
+
+    def on_run_start(self, workers: int):
+        if self.max_limit is None:
+            self._upper_limit = max(workers, self.min_limit)
+        self.limit = min(self.limit, self._upper_limit)  # type: ignore
+
+    def on_action_finish(self, outcome: ActionOutcome, queue_depth: int):
+        self.observe(outcome)
+
+    def on_retry(self, outcome: ActionOutcome, queue_depth: int):
+        self.observe(outcome)
+
+    def is_error(self, outcome: ActionOutcome) -> bool:
+        return (
+            outcome.error is not None or outcome.http_status in self.overload_statuses
+        )
+
+    def observe(self, outcome: ActionOutcome):
+        """Record an attempt, adjusting the limit at the end of a window."""
+        if outcome.status is OutcomeStatus.EXPIRED:
+            return
+        self._latencies.append(outcome.latency)
+        if self.is_error(outcome):
+            self._errors += 1
+        if len(self._latencies) >= self.window:
+            self.adjust()
+
+    def adjust(self):
+        latencies = sorted(self._latencies)
+        median = latencies[len(latencies) // 2]
+        overloaded = self._errors > self.error_threshold * len(latencies)
+        if self.baseline_latency is None or median < self.baseline_latency:
+            self.baseline_latency = median
+        elif median > self.baseline_latency * self.latency_tolerance:
+            overloaded = True
+        if overloaded:
+            self.set_limit(int(self.limit * self.backoff))
+        elif self._saturated:
+            self.set_limit(self.limit + 1)
+        self._latencies = []
+        self._errors = 0
+        self._saturated = False
+
+    def set_limit(self, limit: int):
+        upper_limit = self._upper_limit
+        if upper_limit is None:
+            upper_limit = limit
+        limit = min(max(limit, self.min_limit), upper_limit)
+        if limit != self.limit:
+            self.limit = limit
+            self.limits.append(limit)
+        self._wake_waiters()
+
+    async def acquire(self):
+        """Wait for a slot."""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        self._saturated = True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over as we were cancelled.
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc: Any, traceback: Any):
+        self.release()
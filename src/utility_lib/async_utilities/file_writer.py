@@ -0,0 +1,144 @@
+"""
+Off loop file persistence for async code.
+
+A `FileWriter` runs blocking save functions on a dedicated thread, so
+coroutines handing it data only wait for a free slot, never for the disk.
+"""
+import asyncio
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_STOP = object()
+
+
+class FileWriter:
+    """
+    Runs save functions on a dedicated writer thread.
+
+    Save functions are called as `save_func(data, file_path)`, like
+    `async_queue.save_string`, and should return True when the file was
+    written. Saves are taken from the queue in batches, and with `fsync`
+    enabled, every file written in a batch is synced to disk before the batch
+    is reported done.
+
+    Use as an async context manager, or call `start` and `close` from
+    inside the running event loop.
+
+    Parameters
+    ----------
+    max_pending : int, optional
+        Most saves waiting for the writer thread before `submit` waits,
+        by default 100
+    batch_size : int, optional
+        Most saves handled per batch, by default 32
+    fsync : bool, optional
+        Sync written files to disk after each batch, by default False
+    """
+
+    def __init__(self, max_pending: int = 100, batch_size: int = 32, fsync=False):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._jobs: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        if self._thread is not None:
+            raise ValueError("FileWriter has already been started.")
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._thread = threading.Thread(
+            target=self._run, name="FileWriter", daemon=True
+        )
+        self._thread.start()
+
+    async def submit(
+        self, save_func: Callable[[Any, Path], bool], data: Any, file_path: Path
+    ) -> "asyncio.Future[bool]":
+        """
+        Hand a save to the writer thread, waiting only if `max_pending` saves
+        are already waiting.
+
+        Returns
+        -------
+        asyncio.Future[bool]
+            Resolves to the result of `save_func` once the save is done (and
+            synced, if `fsync` is enabled). Awaiting it is optional.
+        """
+        if self._slots is None or self._loop is None:
+            raise ValueError("FileWriter has not been started.")
+        await self._slots.acquire()
+        future = self._loop.create_future()
+        self._jobs.put((save_func, data, file_path, future))
+        return future
+
+    async def close(self):
+        """Finish all submitted saves, then stop the writer thread."""
+        if self._thread is None:
+            return
+        self._jobs.put(_STOP)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        self._thread = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    def _next_batch(self) -> Tuple[List[Any], bool]:
+        batch = [self._jobs.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._jobs.get_nowait())
+            except queue.Empty:
+                break
+        if _STOP in batch:
+            return [x for x in batch if x is not _STOP], True
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            done = []
+            for save_func, data, file_path, future in batch:
+                try:
+                    result: Any = save_func(data, file_path)
+                except Exception as exc:  # pylint: disable=broad-except
+                    result = exc
+                done.append((file_path, future, result))
+            sync_errors: Dict[Path, Exception] = {}
+            if self.fsync:
+                for file_path in {x[0] for x in done if x[2] is True}:
+                    try:
+                        sync_file(file_path)
+                    except OSError as exc:
+                        sync_errors[file_path] = exc
+            for file_path, future, result in done:
+                result = sync_errors.get(file_path, result)
+                self._loop.call_soon_threadsafe(self._finish, future, result)
+
+    def _finish(self, future: asyncio.Future, result: Any):
+        self._slots.release()
+        if future.cancelled():
+            return
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+def sync_file(file_path: Path):
+    """Flush a closed file's contents to disk."""
+    file_descriptor = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
@@ -0,0 +1,263 @@
+"""
+An on disk cache for conditional HTTP requests.
+
+Responses with an ETag, Last-Modified or expiry time are stored by method, url
+and params. While an entry is fresh it is replayed without a request, after
+that it is revalidated with If-None-Match/If-Modified-Since, and replayed
+again on a 304 Not Modified.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, Mapping, Optional
+from uuid import uuid4
+
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+# Headers that describe the body, kept from the cached response on a 304.
+BODY_HEADERS = ("content-length", "content-type", "content-encoding")
+# aiohttp hands over decoded bodies, these would not match the cached body.
+TRANSFER_HEADERS = ("content-length", "content-encoding", "transfer-encoding")
+
+
+def cache_key(
+    method: str,
+    url: str,
+    request_params: Optional[Mapping[str, Any]] = None,
+    request_json: Any = None,
+) -> str:
+    """
+    A stable key for a request, from its method, url, params and json body.
+    """
+    key_data = json.dumps(
+        [method.upper(), str(url), request_params or {}, request_json],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key_data.encode("utf8")).hexdigest()
+
+
+def expiry_time(headers: Mapping[str, str], now: Optional[float] = None) -> float:
+    """
+    When a response goes stale, as epoch seconds, from `Cache-Control: max-age`
+    or `Expires`. 0.0 if the response must always be revalidated.
+    """
+    if now is None:
+        now = time.time()
+    cache_control = headers.get("Cache-Control", "")
+    if "no-cache" in cache_control:
+        return 0.0
+    max_age = MAX_AGE.search(cache_control)
+    if max_age is not None:
+        return now + int(max_age.group(1))
+    expires = headers.get("Expires", None)
+    if expires is None:
+        return 0.0
+    try:
+        return parsedate_to_datetime(expires).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return 0.0
+
+
+class CachedBody:
+    """Stands in for `aiohttp.StreamReader`, over a body already in memory."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def read(self, n: int = -1) -> bytes:
+        _ = n
+        return self._body
+
+    async def iter_chunked(self, n: int) -> AsyncGenerator[bytes, None]:
+        for start in range(0, len(self._body), n):
+            yield self._body[start : start + n]
+
+
+class CachedResponse:
+    """
+    Stands in for `aiohttp.ClientResponse` when replaying a cached (or shared)
+    body to response handlers.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        status: int,
+        headers: Mapping[str, str],
+        body: bytes,
+        from_cache: bool = True,
+    ):
+        self.url = URL(url)
+        self.status = status
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self.content = CachedBody(body)
+        self.from_cache = from_cache
+        self._body = body
+
+    @property
+    def charset(self) -> Optional[str]:
+        content_type = self.headers.get("Content-Type", "")
+        for param in content_type.split(";")[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "charset":
+                return value.strip().strip('"')
+        return None
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict"):
+        if encoding is None:
+            encoding = self.charset or "utf-8"
+        return self._body.decode(encoding, errors)
+
+    async def json(
+        self, *, encoding: Optional[str] = None, loads=json.loads, content_type=None
+    ):
+        _ = content_type
+        return loads(await self.text(encoding=encoding))
+
+    def release(self):
+        pass
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    url: str
+    status: int
+    headers: Dict[str, str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    expires: float = 0.0
+    body: bytes = field(default=b"", repr=False)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.time()
+        return self.expires > now
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers to revalidate this entry."""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_response(self) -> CachedResponse:
+        return CachedResponse(self.url, self.status, self.headers, self.body)
+
+
+class HttpCache:
+    """
+    Stores cacheable responses under `cache_dir`, one metadata and one body
+    file per request. File access runs in the default executor.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Directory for cache files, created if needed.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+
+    def _paths(self, key: str):
+        return (
+            self.cache_dir / key[:2] / f"{key}.json",
+            self.cache_dir / key[:2] / f"{key}.body",
+        )
+
+    @staticmethod
+    def is_cacheable(headers: Mapping[str, str]) -> bool:
+        cache_control = headers.get("Cache-Control", "")
+        if "no-store" in cache_control:
+            return False
+        return (
+            "ETag" in headers
+            or "Last-Modified" in headers
+            or expiry_time(headers) > time.time()
+        )
+
+    async def lookup(self, key: str) -> Optional[CacheEntry]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._load, key)
+
+    async def store(
+        self, key: str, url: str, status: int, headers: Mapping[str, str], body: bytes
+    ) -> CacheEntry:
+        entry = CacheEntry(
+            key=key,
+            url=str(url),
+            status=status,
+            headers={
+                name: value
+                for name, value in headers.items()
+                if name.lower() not in TRANSFER_HEADERS
+            },
+            etag=headers.get("ETag", None),
+            last_modified=headers.get("Last-Modified", None),
+            expires=expiry_time(headers),
+            body=body,
+        )
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._save, entry, True)
+        return entry
+
+    async def refresh(
+        self, entry: CacheEntry, headers: Mapping[str, str]
+    ) -> CacheEntry:
+        """Update an entry from the headers of a 304 Not Modified."""
+        fresh = {
+            name: value
+            for name, value in headers.items()
+            if name.lower() not in BODY_HEADERS
+        }
+        fresh_names = {name.lower() for name in fresh}
+        entry.headers = {
+            name: value
+            for name, value in entry.headers.items()
+            if name.lower() not in fresh_names
+        }
+        entry.headers.update(fresh)
+        entry.etag = headers.get("ETag", entry.etag)
+        entry.last_modified = headers.get("Last-Modified", entry.last_modified)
+        entry.expires = expiry_time(headers)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._save, entry, False)
+        return entry
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        meta_path, body_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(body=body, **meta)
+
+    def _save(self, entry: CacheEntry, with_body: bool):
+        meta_path, body_path = self._paths(entry.key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        if with_body:
+            replace_file(body_path, entry.body)
+        meta = asdict(entry)
+        del meta["body"]
+        replace_file(meta_path, json.dumps(meta).encode("utf8"))
+
+
+def replace_file(file_path: Path, data: bytes):
+    """Write a file by replacing it, so readers never see a partial file."""
+    temp_path = file_path.with_name(f"{file_path.name}.{uuid4().hex}.tmp")
+    temp_path.write_bytes(data)
+    temp_path.replace(file_path)
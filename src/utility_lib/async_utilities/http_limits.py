@@ -0,0 +1,246 @@
+"""
+Limits shared by all workers of a `HttpQueueRunner`.
+
+Limiters create their asyncio primitives lazily, inside the running event loop.
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+
+def url_host(url: str) -> str:
+    """
+    The host (and port, if given) part of a url, used to key per host limits.
+
+    Parameters
+    ----------
+    url : str
+        A url.
+
+    Returns
+    -------
+    str
+        The host, e.g. "esi.evetech.net"
+    """
+    return urlsplit(str(url)).netloc
+
+
+class HostConcurrencyLimiter:
+    """
+    Caps the number of in flight requests to any one host.
+
+    Parameters
+    ----------
+    limit_per_host : int
+        Maximum concurrent requests per host.
+    """
+
+    def __init__(self, limit_per_host: int):
+        if limit_per_host < 1:
+            raise ValueError(f"limit_per_host must be at least 1, got {limit_per_host}")
+        self.limit_per_host = limit_per_host
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host, None)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limit_per_host)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """Hold a request slot for the host of `url`."""
+        async with self.semaphore(url_host(url)):
+            yield
+
+
+def parse_retry_after(
+    value: Optional[str], now: Optional[datetime] = None
+) -> Optional[float]:
+    """
+    Seconds to wait as given by a `Retry-After` header.
+
+    Parameters
+    ----------
+    value : Optional[str]
+        Header value, either a number of seconds or an HTTP date.
+    now : Optional[datetime], optional
+        Current time for HTTP dates, by default `datetime.now(timezone.utc)`
+
+    Returns
+    -------
+    Optional[float]
+        Seconds to wait, or None if the header is missing or unreadable.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    if now is None:
+        now = datetime.now(timezone.utc)
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """
+    A token bucket that waiters queue on in arrival order.
+
+    Each `acquire` takes a token, going into debt if none are left, and
+    sleeps until its share of the debt has refilled. The bucket can also be
+    paused, e.g. when a server asks clients to back off.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+    capacity : Optional[float], optional
+        Most tokens the bucket holds, i.e. the burst size, by default `rate`
+        (at least 1)
+    clock : Callable[[], float], optional
+        Monotonic clock in seconds, by default `time.monotonic`
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0:
+            raise ValueError(f"rate must be greater than 0, got {rate}")
+        self.rate = rate
+        if capacity is None:
+            capacity = max(rate, 1.0)
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def paused_for(self) -> float:
+        """Seconds until the bucket is no longer paused."""
+        return max(self._paused_until - self._clock(), 0.0)
+
+    def pause_for(self, seconds: float):
+        """
+        Stop handing out tokens for `seconds`. Tokens do not refill while paused.
+        """
+        now = self._clock()
+        until = now + seconds
+        if until <= self._paused_until:
+            return
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+        self._paused_until = until
+        self._updated = until
+
+    async def acquire(self):
+        now = self._clock()
+        self._refill(now)
+        self._tokens -= 1
+        delay = max(-self._tokens / self.rate, self._paused_until - now)
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.paused_for()
+
+
+class RateLimiter(ABC):
+    """
+    Decides when a request may be sent, and learns from server responses.
+
+    One instance is shared by all workers of a `HttpQueueRunner`.
+    """
+
+    @abstractmethod
+    async def acquire(self, url: str):
+        """Wait until a request to `url` may be sent."""
+
+    def observe(self, url: str, status: int, headers: Mapping[str, str]):
+        """Called with the status and headers of every response."""
+
+
+class HostRateLimiter(RateLimiter):
+    """
+    A token bucket per host, paused when the server asks for a back off.
+
+    Buckets are paused for the `Retry-After` header, and until the error
+    budget resets when the remaining error budget (as sent by e.g. ESI's
+    `X-Esi-Error-Limit-Remain` and `X-Esi-Error-Limit-Reset` headers) falls to
+    `error_limit_threshold` or below.
+
+    Parameters
+    ----------
+    requests_per_second : float
+        Steady request rate allowed per host.
+    burst : Optional[float], optional
+        Requests that may be sent at once after an idle period, by default
+        `requests_per_second`
+    error_limit_threshold : int, optional
+        Pause a host when its remaining error budget is at or below this,
+        by default 10
+    error_limit_remain_header : str, optional
+        by default "X-Esi-Error-Limit-Remain"
+    error_limit_reset_header : str, optional
+        Seconds until the error budget resets, by default "X-Esi-Error-Limit-Reset"
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float,
+        burst: Optional[float] = None,
+        error_limit_threshold: int = 10,
+        error_limit_remain_header: str = "X-Esi-Error-Limit-Remain",
+        error_limit_reset_header: str = "X-Esi-Error-Limit-Reset",
+    ):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.error_limit_threshold = error_limit_threshold
+        self.error_limit_remain_header = error_limit_remain_header
+        self.error_limit_reset_header = error_limit_reset_header
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host, None)
+        if bucket is None:
+            bucket = TokenBucket(self.requests_per_second, self.burst)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, url: str):
+        await self.bucket(url_host(url)).acquire()
+
+    def observe(self, url: str, status: int, headers: Mapping[str, str]):
+        bucket = self.bucket(url_host(url))
+        retry_after = parse_retry_after(headers.get("Retry-After", None))
+        if retry_after:
+            bucket.pause_for(retry_after)
+        remain = headers.get(self.error_limit_remain_header, None)
+        reset = headers.get(self.error_limit_reset_header, None)
+        if remain is None or reset is None:
+            return
+        try:
+            if int(remain) <= self.error_limit_threshold:
+                bucket.pause_for(float(reset))
+        except ValueError:
+            return
@@ -0,0 +1,211 @@
+"""
+Instrumentation hooks for the async queue runners.
+
+Attach `RunnerInstrument`s to a runner, e.g.
+`HttpQueueRunner(instruments=[MetricsCollector()])`, to be called as the
+runner starts and stops, and as each action starts, finishes or is retried.
+"""
+import math
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional
+
+from utility_lib.async_utilities.outcomes import ActionOutcome, OutcomeStatus
+
+
+class RunnerInstrument:
+    """
+    Runner hooks that do nothing, override the ones you need.
+
+    Hooks are called from the event loop, and should be quick.
+    """
+
+    def on_run_start(self, workers: int):
+        """Called before the workers start."""
+
+    def on_run_finish(self):
+        """Called after the last action is done."""
+
+    def on_action_start(self, action: Any, queue_depth: int):
+        """Called as a worker picks up an action."""
+
+    def on_action_finish(self, outcome: ActionOutcome, queue_depth: int):
+        """Called when an action succeeds or fails for good."""
+
+    def on_retry(self, outcome: ActionOutcome, queue_depth: int):
+        """Called when an action was put back on the queue for another try."""
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies in nanoseconds, with log spaced buckets.
+
+    Memory use depends on the range of latencies, not on how many are
+    recorded. Percentiles are accurate to within half a bucket width,
+    about 4.5% with the default `buckets_per_doubling`.
+
+    Parameters
+    ----------
+    buckets_per_doubling : int, optional
+        Buckets between a latency and twice that latency, by default 8
+    """
+
+    def __init__(self, buckets_per_doubling: int = 8):
+        self._log_base = math.log(2) / buckets_per_doubling
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns: Optional[int] = None
+        self.max_ns: Optional[int] = None
+
+    def record(self, latency_ns: int):
+        bucket = int(math.log(max(latency_ns, 1)) / self._log_base)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total_ns += latency_ns
+        if self.min_ns is None or latency_ns < self.min_ns:
+            self.min_ns = latency_ns
+        if self.max_ns is None or latency_ns > self.max_ns:
+            self.max_ns = latency_ns
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        The latency in nanoseconds below which `percent` of latencies fall,
+        or None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+        rank = max(math.ceil(self.count * percent / 100), 1)
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                # the middle of the bucket, kept within the values recorded.
+                estimate = math.exp((bucket + 0.5) * self._log_base)
+                return min(max(estimate, self.min_ns), self.max_ns)  # type: ignore
+        return float(self.max_ns)  # type: ignore
+
+    def mean(self) -> Optional[float]:
+        if not self.count:
+            return None
+        return self.total_ns / self.count
+
+
+class MetricsCollector(RunnerInstrument):
+    """
+    Collects latency, throughput, queue depth, worker utilisation, retry and
+    transfer figures for a runner.
+
+    Latencies are per attempt, so retried attempts are included. If the
+    collector is attached to several runs, figures are totals over all runs,
+    and worker utilisation assumes the worker count of the latest run.
+    """
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.workers = 0
+        self.started = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.expired = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.max_queue_depth = 0
+        self._queue_depth_total = 0
+        self._busy_ns = 0
+        self._start_ns: Optional[int] = None
+        self._finish_ns: Optional[int] = None
+
+    def on_run_start(self, workers: int):
+        self.workers = workers
+        if self._start_ns is None:
+            self._start_ns = perf_counter_ns()
+        self._finish_ns = None
+
+    def on_run_finish(self):
+        self._finish_ns = perf_counter_ns()
+
+    def on_action_start(self, action: Any, queue_depth: int):
+        self.started += 1
+        self._queue_depth_total += queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def _record(self, outcome: ActionOutcome):
+        latency_ns = int(outcome.latency * 1_000_000_000)
+        self.latency.record(latency_ns)
+        self._busy_ns += latency_ns
+        self.bytes_received += outcome.bytes_received
+
+    def on_action_finish(self, outcome: ActionOutcome, queue_depth: int):
+        if outcome.status is OutcomeStatus.EXPIRED:
+            self.expired += 1
+            return
+        self._record(outcome)
+        if outcome.status is OutcomeStatus.SUCCESS:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def on_retry(self, outcome: ActionOutcome, queue_depth: int):
+        self._record(outcome)
+        self.retries += 1
+
+    def elapsed_ns(self) -> int:
+        if self._start_ns is None:
+            return 0
+        finish_ns = self._finish_ns
+        if finish_ns is None:
+            finish_ns = perf_counter_ns()
+        return finish_ns - self._start_ns
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        The collected figures. Latencies are in seconds, None if nothing
+        finished yet.
+        """
+        elapsed = self.elapsed_ns() / 1_000_000_000
+        attempts = self.latency.count
+
+        def seconds(nanoseconds: Optional[float]) -> Optional[float]:
+            if nanoseconds is None:
+                return None
+            return nanoseconds / 1_000_000_000
+
+        return {
+            "elapsed": elapsed,
+            "started": self.started,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "expired": self.expired,
+            "retries": self.retries,
+            "requests_per_second": attempts / elapsed if elapsed else 0.0,
+            "latency_mean": seconds(self.latency.mean()),
+            "latency_p50": seconds(self.latency.percentile(50)),
+            "latency_p95": seconds(self.latency.percentile(95)),
+            "latency_p99": seconds(self.latency.percentile(99)),
+            "latency_max": seconds(self.latency.max_ns),
+            "max_queue_depth": self.max_queue_depth,
+            "mean_queue_depth": (
+                self._queue_depth_total / self.started if self.started else 0.0
+            ),
+            "worker_utilisation": (
+                self._busy_ns / (self.elapsed_ns() * self.workers)
+                if self.workers and self.elapsed_ns()
+                else 0.0
+            ),
+            "bytes_received": self.bytes_received,
+        }
+
+    def report_lines(self) -> List[str]:
+        """The summary as human readable lines."""
+        lines = []
+        for name, value in self.summary().items():
+            if value is None:
+                formatted = "-"
+            elif name.startswith("latency") or name == "elapsed":
+                formatted = f"{value:9f} seconds."
+            elif isinstance(value, float):
+                formatted = f"{value:.3f}"
+            else:
+                formatted = str(value)
+            lines.append(f"{name}: {formatted}")
+        return lines
@@ -0,0 +1,198 @@
+"""
+A durable journal of queued and finished actions, so a long job can resume.
+
+Attach a `RunJournal` to a runner, e.g.
+`HttpQueueRunner(journal=RunJournal(Path("crawl.sqlite")))`. Every action put
+on the queue is recorded as pending, and every finished action as done or
+failed. If the process dies, run the same job again with the same journal:
+finished actions from the source are skipped, and pending actions, including
+extra pages and retries put on the queue by workers, are queued again first.
+"""
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, AsyncIterable, Iterable, List, Set, Union
+
+from utility_lib.async_utilities.instrumentation import RunnerInstrument
+from utility_lib.async_utilities.outcomes import ActionOutcome, OutcomeStatus
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS actions (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    action BLOB,
+    updated REAL NOT NULL
+)
+"""
+
+
+def journal_key(action: Any) -> str:
+    """The key an action is journaled under, from its `journal_key` method."""
+    try:
+        return action.journal_key()
+    except AttributeError:
+        raise TypeError(
+            f"{type(action).__name__} needs a journal_key method to be journaled."
+        ) from None
+
+
+class RunJournal(RunnerInstrument):
+    """
+    Records actions in a SQLite database as they are queued and finished.
+
+    Actions are keyed by `journal_key`, so actions with the same key count as
+    the same action, and keys must be unique within a job: once one of them
+    finishes, the others are skipped by a resumed run. An `HttpAction`'s key
+    is its method, url and params, so two requests for the same url with
+    different handlers or context need a subclass with its own `journal_key`.
+
+    Pending actions are pickled with their context, so they can be queued
+    again after a restart; actions that don't pickle are only recorded by
+    key, and must come from the source again to be resumed.
+
+    Writes are committed every `commit_every` changes and at the end of a run,
+    so a crash can lose the last few records, and those actions run again.
+
+    Parameters
+    ----------
+    path : Path
+        The SQLite database, created if needed.
+    commit_every : int, optional
+        Changes between commits, by default 100
+    retry_failed : bool, optional
+        Run actions that failed in an earlier run again, by default False
+    save_actions : bool, optional
+        Pickle pending actions so they can be queued again, by default True
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        commit_every: int = 100,
+        retry_failed: bool = False,
+        save_actions: bool = True,
+    ):
+        self.path = Path(path)
+        self.commit_every = commit_every
+        self.retry_failed = retry_failed
+        self.save_actions = save_actions
+        self._connection = None
+        self._changes = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path))
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(SCHEMA)
+            self._connection.commit()
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def _write(self, key: str, status: str, action_data: Any = None):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO actions (key, status, action, updated)"
+            " VALUES (?, ?, ?, ?)",
+            (key, status, action_data, time.time()),
+        )
+        self._changes += 1
+        if self._changes >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        if self._connection is not None:
+            self._connection.commit()
+        self._changes = 0
+
+    def record_pending(self, action: Any):
+        """Record an action put on the queue."""
+        action_data = None
+        if self.save_actions:
+            try:
+                action_data = pickle.dumps(action, pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                action_data = None
+        self._write(journal_key(action), PENDING, action_data)
+
+    def record_finished(self, outcome: ActionOutcome):
+        if outcome.status is OutcomeStatus.SUCCESS:
+            status = DONE
+        else:
+            status = FAILED
+        self._write(journal_key(outcome.action), status)
+
+    def statuses(self, *statuses: str) -> Set[str]:
+        """The keys of actions with any of `statuses`."""
+        placeholders = ", ".join("?" for _ in statuses)
+        rows = self.connection.execute(
+            f"SELECT key FROM actions WHERE status IN ({placeholders})", statuses
+        )
+        return {row[0] for row in rows}
+
+    def pending_actions(self) -> List[Any]:
+        """Pending actions saved by an earlier run, oldest first."""
+        statuses = [PENDING]
+        if self.retry_failed:
+            statuses.append(FAILED)
+        placeholders = ", ".join("?" for _ in statuses)
+        rows = self.connection.execute(
+            "SELECT action FROM actions WHERE action IS NOT NULL"
+            f" AND status IN ({placeholders}) ORDER BY updated",
+            statuses,
+        )
+        actions = []
+        for (action_data,) in rows:
+            try:
+                actions.append(pickle.loads(action_data))
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"Could not restore journaled action: {exc!r}")
+        return actions
+
+    async def resume(
+        self, actions: Union[Iterable[Any], AsyncIterable[Any]]
+    ) -> AsyncIterator[Any]:
+        """
+        Pending actions from an earlier run, then the actions from `actions`
+        that weren't finished or restored from an earlier run.
+
+        Actions in `actions` with the same key are all run, but count as one
+        action in the journal, so keys should be unique within a job.
+        """
+        skip = self.statuses(DONE)
+        if not self.retry_failed:
+            skip |= self.statuses(FAILED)
+        for action in self.pending_actions():
+            skip.add(journal_key(action))
+            yield action
+        if hasattr(actions, "__aiter__"):
+            async for action in actions:  # type: ignore
+                if journal_key(action) not in skip:
+                    yield action
+        else:
+            for action in actions:  # type: ignore
+                if journal_key(action) not in skip:
+                    yield action
+
+    def on_action_finish(self, outcome: ActionOutcome, queue_depth: int):
+        self.record_finished(outcome)
+
+    def on_run_finish(self):
+        self.commit()
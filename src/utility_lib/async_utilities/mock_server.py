@@ -0,0 +1,166 @@
+"""
+A local mock of a paginated market API, for testing and benchmarking the
+queue runners without hitting a real server.
+
+    api = MockApi(MockApiConfig(pages=10, latency=0.02, error_rate=0.01))
+    async with api.serve() as url:
+        await HttpQueueRunner().do_queue(
+            [HttpAction("GET", url, request_params={"page": 1})], 10
+        )
+"""
+import asyncio
+import json
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Sequence
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+@dataclass
+class MockApiConfig:
+    """
+    How the mock API behaves.
+
+    Parameters
+    ----------
+    pages : int, optional
+        Pages of orders, sent as the `x-pages` header, by default 1
+    items_per_page : int, optional
+        Orders per page, by default 100
+    latency : float, optional
+        Seconds before each response, by default 0.0
+    latency_jitter : float, optional
+        Up to this many seconds added to `latency` at random, by default 0.0
+    error_rate : float, optional
+        Share of requests answered with one of `error_statuses`, by default 0.0
+    error_statuses : Sequence[int], optional
+        Statuses for injected errors, by default (503, 504)
+    error_limit : int, optional
+        Errors allowed per `error_limit_window` before every request gets a 420,
+        reported in the `X-Esi-Error-Limit-Remain` header, by default 100
+    error_limit_window : float, optional
+        Seconds until the error limit resets, reported in the
+        `X-Esi-Error-Limit-Reset` header, by default 60.0
+    seed : Optional[int], optional
+        Seed for injected latency and errors, by default None
+    """
+
+    pages: int = 1
+    items_per_page: int = 100
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    error_rate: float = 0.0
+    error_statuses: Sequence[int] = (503, 504)
+    error_limit: int = 100
+    error_limit_window: float = 60.0
+    seed: Optional[int] = None
+
+
+class MockApi:
+    """
+    Serves `GET /orders?page=n` like a paginated market orders endpoint.
+
+    Parameters
+    ----------
+    config : Optional[MockApiConfig], optional
+        by default `MockApiConfig()`
+    """
+
+    def __init__(self, config: Optional[MockApiConfig] = None):
+        if config is None:
+            self.config = MockApiConfig()
+        else:
+            self.config = config
+        self.requests = 0
+        self.errors = 0
+        self.statuses: Dict[int, int] = {}
+        self._random = random.Random(self.config.seed)
+        self._bodies: Dict[int, bytes] = {}
+        self._error_limit_remain = self.config.error_limit
+        self._window_start = time.monotonic()
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/orders", self.handle_orders)
+        return app
+
+    @asynccontextmanager
+    async def serve(self) -> AsyncIterator[str]:
+        """Run the API on a free local port, yielding the orders url."""
+        server = TestServer(self.make_app())
+        await server.start_server()
+        try:
+            yield str(server.make_url("/orders"))
+        finally:
+            await server.close()
+
+    def page_body(self, page: int) -> bytes:
+        """The JSON orders for `page`, built once."""
+        if page not in self._bodies:
+            first_id = (page - 1) * self.config.items_per_page
+            orders = [
+                {
+                    "order_id": order_id,
+                    "type_id": 34 + order_id % 50,
+                    "location_id": 60003760,
+                    "price": round(5 + (order_id % 1000) * 0.01, 2),
+                    "volume_remain": order_id % 10000,
+                    "is_buy_order": order_id % 2 == 0,
+                    "issued": "2021-01-01T00:00:00Z",
+                }
+                for order_id in range(first_id, first_id + self.config.items_per_page)
+            ]
+            self._bodies[page] = json.dumps(orders).encode("utf8")
+        return self._bodies[page]
+
+    def error_limit_headers(self) -> Dict[str, str]:
+        now = time.monotonic()
+        if now - self._window_start >= self.config.error_limit_window:
+            self._window_start = now
+            self._error_limit_remain = self.config.error_limit
+        reset = self.config.error_limit_window - (now - self._window_start)
+        return {
+            "X-Esi-Error-Limit-Remain": str(self._error_limit_remain),
+            "X-Esi-Error-Limit-Reset": str(max(int(reset), 0)),
+        }
+
+    def error_response(self, status: int) -> web.Response:
+        self.errors += 1
+        self._error_limit_remain = max(self._error_limit_remain - 1, 0)
+        return self.respond(web.json_response({"error": "mock error"}, status=status))
+
+    def respond(self, response: web.Response) -> web.Response:
+        response.headers.update(self.error_limit_headers())
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+        return response
+
+    async def handle_orders(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        config = self.config
+        delay = config.latency + self._random.random() * config.latency_jitter
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.error_limit_headers()
+        if self._error_limit_remain <= 0:
+            return self.respond(
+                web.json_response({"error": "error limited"}, status=420)
+            )
+        if config.error_rate and self._random.random() < config.error_rate:
+            return self.error_response(self._random.choice(config.error_statuses))
+        try:
+            page = int(request.query.get("page", "1"))
+        except ValueError:
+            return self.error_response(400)
+        if not 1 <= page <= config.pages:
+            return self.error_response(404)
+        return self.respond(
+            web.Response(
+                body=self.page_body(page),
+                content_type="application/json",
+                headers={"x-pages": str(config.pages)},
+            )
+        )
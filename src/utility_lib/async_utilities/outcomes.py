@@ -0,0 +1,49 @@
+"""
+The outcome of running a queue action.
+"""
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Optional
+
+
+class OutcomeStatus(Enum):
+    SUCCESS = "success"
+    FAILED = "failed"
+    RETRYING = "retrying"
+    EXPIRED = "expired"
+
+
+@dataclass
+class ActionOutcome:
+    """
+    What became of one run of an action.
+
+    Parameters
+    ----------
+    action : Any
+        The action.
+    status : OutcomeStatus
+        SUCCESS or FAILED when the action is done, RETRYING if it was put
+        back on the queue, EXPIRED if its deadline passed before it ran.
+    result : Any, optional
+        The value returned by the action, by default None
+    error : Optional[BaseException], optional
+        The exception that failed the action, if any, by default None
+    http_status : Optional[int], optional
+        HTTP status of the last response, for `HttpAction`s, by default None
+    attempts : int, optional
+        Number of times the action has been run, by default 1
+    latency : float, optional
+        Seconds taken by the last run, by default 0.0
+    bytes_received : int, optional
+        Size of the response body read from the network, by default 0
+    """
+
+    action: Any
+    status: OutcomeStatus
+    result: Any = None
+    error: Optional[BaseException] = None
+    http_status: Optional[int] = None
+    attempts: int = 1
+    latency: float = 0.0
+    bytes_received: int = 0
@@ -0,0 +1,110 @@
+"""
+Delayed retries for queue actions.
+
+A retried action waits out its back off in a background task, not in a
+worker, so the other workers keep going while it waits.
+"""
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential back off with jitter.
+
+    The delay before retry `attempt` is drawn from
+    `[cap * (1 - jitter), cap]`, where
+    `cap = min(max_delay, base_delay * multiplier ** (attempt - 1))`.
+
+    Parameters
+    ----------
+    base_delay : float, optional
+        Seconds before the first retry, by default 0.5
+    multiplier : float, optional
+        Growth of the delay per attempt, by default 2.0
+    max_delay : float, optional
+        Longest delay in seconds, by default 60.0
+    jitter : float, optional
+        Fraction of the delay that is randomized, 1.0 for "full jitter",
+        0.0 for none, by default 1.0
+    """
+
+    base_delay: float = 0.5
+    multiplier: float = 2.0
+    max_delay: float = 60.0
+    jitter: float = 1.0
+
+    def delay(self, attempt: int) -> float:
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return cap * (1 - self.jitter * random.random())
+
+
+class RetryScheduler:
+    """
+    Puts actions back on a queue after their back off delay.
+
+    Parameters
+    ----------
+    policy : RetryPolicy, optional
+        by default `RetryPolicy()`
+    """
+
+    def __init__(self, policy: RetryPolicy = None):
+        if policy is None:
+            self.policy = RetryPolicy()
+        else:
+            self.policy = policy
+        self._pending: Dict[asyncio.Task, Any] = {}
+
+    @property
+    def pending(self) -> int:
+        """Number of retries waiting to be put back on a queue."""
+        return len(self._pending)
+
+    def schedule(self, queue: asyncio.Queue, action: Any, attempt: int) -> float:
+        """
+        Put `action` back on `queue` after the delay for `attempt`.
+
+        Returns
+        -------
+        float
+            The delay in seconds.
+        """
+        delay = self.policy.delay(attempt)
+        task = asyncio.create_task(self._requeue(queue, action, delay))
+        self._pending[task] = action
+        task.add_done_callback(self._discard)
+        return delay
+
+    def _discard(self, task: asyncio.Task):
+        self._pending.pop(task, None)
+
+    @staticmethod
+    async def _requeue(queue: asyncio.Queue, action: Any, delay: float):
+        await asyncio.sleep(delay)
+        queue.put_nowait(action)
+
+    async def join(self, queue: asyncio.Queue):
+        """Wait until `queue` is done and no retries are waiting to rejoin it."""
+        await queue.join()
+        while self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+            await queue.join()
+
+    async def cancel(self) -> List[Any]:
+        """
+        Drop any retries that are still waiting.
+
+        Returns
+        -------
+        List[Any]
+            The actions that were waiting to be retried.
+        """
+        pending = dict(self._pending)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return [action for task, action in pending.items() if task.cancelled()]
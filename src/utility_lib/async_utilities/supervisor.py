@@ -0,0 +1,275 @@
+"""
+Run queue runners on their own event loops, from synchronous code.
+
+A `RunnerSupervisor` keeps a number of runners, each on an event loop in a
+thread of its own, or runs each job in a process of its own. Jobs are
+submitted from any thread and come back as `concurrent.futures.Future`s:
+
+    with RunnerSupervisor(HttpQueueRunner, loops=4) as supervisor:
+        futures = [supervisor.submit(actions, 16) for actions in jobs]
+        for future in as_completed(futures):
+            outcomes = future.result()
+
+Loops in threads share the GIL, so they suit jobs that mostly wait on the
+network. With `use_processes`, each job runs on a loop in another process, so
+the loop overhead itself is spread over the cores.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import wait as futures_wait
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+from utility_lib.async_utilities.async_queue import QueueRunner
+from utility_lib.async_utilities.outcomes import ActionOutcome
+
+
+class LoopThread:
+    """
+    An event loop running in a daemon thread.
+
+    Parameters
+    ----------
+    name : Optional[str], optional
+        Name of the thread, by default None
+    """
+
+    def __init__(self, name: Optional[str] = None):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True)
+            )
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        finally:
+            self.loop.close()
+
+    def start(self):
+        self.thread.start()
+
+    def submit(self, coroutine) -> Future:
+        """Run `coroutine` on the loop, from any thread."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call_soon(self, callback: Callable, *args: Any):
+        """Call `callback(*args)` on the loop, from any thread."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self):
+        """Stop the loop, cancelling what is still running on it."""
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+
+class RunnerLane:
+    """
+    A runner on its own `LoopThread`, running the jobs sent to it one at a time.
+
+    Runners that are async context managers, like `HttpQueueRunner`, are
+    entered for the life of the lane, so their sessions are reused by every
+    job.
+    """
+
+    def __init__(self, runner: QueueRunner, name: Optional[str] = None):
+        self.runner = runner
+        self.loop_thread = LoopThread(name)
+        self.jobs = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def start(self):
+        self.loop_thread.start()
+        self.loop_thread.submit(self.open()).result()
+
+    async def open(self):
+        self._lock = asyncio.Lock()
+        if hasattr(self.runner, "__aenter__"):
+            await self.runner.__aenter__()  # type: ignore
+
+    async def close(self):
+        if hasattr(self.runner, "__aexit__"):
+            await self.runner.__aexit__(None, None, None)  # type: ignore
+
+    async def run(self, actions: Iterable[Any], workers: int, **kwargs: Any):
+        async with self._lock:  # type: ignore
+            return await self.runner.do_queue(actions, workers, **kwargs)
+
+    def submit(self, actions: Iterable[Any], workers: int, **kwargs: Any) -> Future:
+        return self.loop_thread.submit(self.run(actions, workers, **kwargs))
+
+    def stop_runner(self, drain: bool = True):
+        """Stop the job in progress, see `QueueRunner.stop`."""
+        self.loop_thread.call_soon(self.runner.stop, drain)
+
+    def stop(self):
+        if self.loop_thread.thread.is_alive():
+            try:
+                self.loop_thread.submit(self.close()).result()
+            finally:
+                self.loop_thread.stop()
+
+
+def run_runner_job(
+    runner_factory: Callable[[], QueueRunner],
+    actions: Iterable[Any],
+    workers: int,
+    maxsize: int = 0,
+    timeout: Optional[float] = None,
+) -> List[ActionOutcome]:
+    """Run a job on a new runner and event loop, in a worker process."""
+    runner = runner_factory()
+    return asyncio.run(runner.do_queue(actions, workers, maxsize, timeout))
+
+
+class RunnerSupervisor:
+    """
+    Runs jobs on several runners, each on its own event loop, with a thread
+    safe `submit`.
+
+    In threads, each loop has one runner from `runner_factory`, which runs
+    the jobs sent to it one after another. A job goes to the loop with the
+    fewest jobs running or waiting.
+
+    In processes, each job runs on a new runner in a pool of `loops`
+    processes, so `runner_factory`, the actions and their outcomes must
+    pickle, and the actions must be a sequence, not a generator.
+
+    Parameters
+    ----------
+    runner_factory : Callable[[], QueueRunner]
+        Makes a runner, e.g. `HttpQueueRunner` or a `functools.partial` of it.
+    loops : int, optional
+        Event loops to run, by default 2
+    use_processes : bool, optional
+        Run the loops in processes rather than threads, by default False
+    """
+
+    def __init__(
+        self,
+        runner_factory: Callable[[], QueueRunner],
+        loops: int = 2,
+        use_processes: bool = False,
+    ):
+        if loops < 1:
+            raise ValueError("A RunnerSupervisor needs at least one loop.")
+        self.runner_factory = runner_factory
+        self.loops = loops
+        self.use_processes = use_processes
+        self.lanes: List[RunnerLane] = []
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Set[Future] = set()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            if self.use_processes:
+                self.executor = ProcessPoolExecutor(self.loops)
+            else:
+                for number in range(self.loops):
+                    lane = RunnerLane(
+                        self.runner_factory(), name=f"RunnerSupervisor-{number}"
+                    )
+                    lane.start()
+                    self.lanes.append(lane)
+            self._started = True
+
+    def submit(
+        self,
+        actions: Iterable[Any],
+        workers: int,
+        maxsize: int = 0,
+        timeout: Optional[float] = None,
+    ) -> Future:
+        """
+        Queue a job, from any thread.
+
+        Parameters are as for `QueueRunner.do_queue`.
+
+        Returns
+        -------
+        Future
+            Resolves to the job's `ActionOutcome`s. Cancelling it cancels a
+            job in a thread, or a job in a process that hasn't started.
+        """
+        self.start()
+        with self._lock:
+            if self.use_processes:
+                future = self.executor.submit(  # type: ignore
+                    run_runner_job,
+                    self.runner_factory,
+                    actions,
+                    workers,
+                    maxsize,
+                    timeout,
+                )
+                lane = None
+            else:
+                lane = min(self.lanes, key=lambda x: x.jobs)
+                lane.jobs += 1
+                future = lane.submit(
+                    actions, workers, maxsize=maxsize, timeout=timeout
+                )
+            self._futures.add(future)
+        future.add_done_callback(lambda done: self._job_done(done, lane))
+        return future
+
+    def _job_done(self, future: Future, lane: Optional[RunnerLane]):
+        with self._lock:
+            self._futures.discard(future)
+            if lane is not None:
+                lane.jobs -= 1
+
+    def stop(self, drain: bool = True):
+        """
+        Stop the jobs running on the loops, see `QueueRunner.stop`. Only
+        stops jobs in threads; jobs in processes can only be cancelled
+        before they start.
+        """
+        for lane in self.lanes:
+            lane.stop_runner(drain)
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False):
+        """
+        Stop the loops once the submitted jobs are done.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            Wait for the submitted jobs, by default True. If False, jobs still
+            running in threads are cancelled.
+        cancel_futures : bool, optional
+            Cancel the jobs that haven't finished first, by default False
+        """
+        with self._lock:
+            futures = list(self._futures)
+            self._started = False
+        if cancel_futures:
+            self.stop(drain=False)
+            for future in futures:
+                future.cancel()
+        if wait:
+            futures_wait(futures)
+        for lane in self.lanes:
+            lane.stop()
+        self.lanes = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.shutdown()
@@ -0,0 +1,179 @@
+"""
+Read csv files into typed columns, rather than one object per row.
+
+Columns are read in batches into `array.array`s, or NumPy arrays if numpy is
+installed, so sums and other aggregates over price or volume columns can run
+over contiguous machine types:
+
+    schema = {"type_id": "int", "price": "float", "volume_remain": "int"}
+    with path.open("r", encoding="utf8", newline="") as file_in:
+        columns = read_columns(file_in, schema)
+    value = (columns["price"] * columns["volume_remain"]).sum()  # with numpy
+"""
+import csv
+from array import array
+from itertools import islice
+from operator import itemgetter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore
+
+DEFAULT_BATCH_SIZE = 65536
+
+TRUE_STRINGS = frozenset(("y", "yes", "t", "true", "on", "1"))
+
+
+def parse_bool(value: str) -> bool:
+    """True for the strings `strtobool` takes as true, otherwise False."""
+    return value.lower() in TRUE_STRINGS
+
+
+# type name: (array typecode, or None for a list of str, converter)
+COLUMN_TYPES: Dict[str, Tuple[Optional[str], Callable[[str], Any]]] = {
+    "int": ("q", int),
+    "float": ("d", float),
+    "bool": ("b", parse_bool),
+    "str": (None, str),
+}
+
+ColumnSpec = Tuple[str, int, Optional[str], Callable[[str], Any]]
+
+
+def column_specs(
+    headers: Sequence[str], schema: Mapping[str, str]
+) -> List[ColumnSpec]:
+    """The name, index, typecode and converter for each column in `schema`."""
+    headers = list(headers)
+    specs = []
+    for name, type_name in schema.items():
+        try:
+            index = headers.index(name)
+        except ValueError:
+            raise ValueError(f"Column {name!r} is not in the csv headers.") from None
+        try:
+            typecode, converter = COLUMN_TYPES[type_name]
+        except KeyError:
+            raise ValueError(
+                f"Unknown type {type_name!r} for column {name!r}, expected one of "
+                f"{', '.join(COLUMN_TYPES)}."
+            ) from None
+        specs.append((name, index, typecode, converter))
+    return specs
+
+
+def _check_numpy(use_numpy: Optional[bool]) -> bool:
+    if use_numpy is None:
+        return numpy is not None
+    if use_numpy and numpy is None:
+        raise ImportError("use_numpy needs numpy to be installed.")
+    return use_numpy
+
+
+def _to_numpy(column: Any) -> Any:
+    if isinstance(column, array):
+        if not column:
+            return numpy.zeros(0, dtype=column.typecode)
+        # shares the array's memory, no copy.
+        return numpy.frombuffer(column, dtype=column.typecode)
+    return column
+
+
+def _convert_batch(rows: List[List[str]], specs: List[ColumnSpec]) -> Dict[str, Any]:
+    batch: Dict[str, Any] = {}
+    for name, index, typecode, converter in specs:
+        values = map(converter, map(itemgetter(index), rows))
+        if typecode is None:
+            batch[name] = list(values)
+        else:
+            batch[name] = array(typecode, values)
+    return batch
+
+
+def read_column_batches(
+    file_in: TextIO,
+    schema: Mapping[str, str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_numpy: Optional[bool] = None,
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    Read a csv file with headers in its first row, in batches of typed columns.
+
+    Parameters
+    ----------
+    file_in : TextIO
+        The csv file, opened with `newline=""`.
+    schema : Mapping[str, str]
+        The columns to read, by header, and their types, one of "int",
+        "float", "bool" or "str". Other columns are skipped.
+    batch_size : int, optional
+        Rows in each batch, by default 65536
+    use_numpy : Optional[bool], optional
+        Return NumPy arrays, by default None, if numpy is installed.
+
+    Yields
+    -------
+    Dict[str, Any]
+        Each column in the batch, by name: an `array.array`, or NumPy array,
+        of int64, float64 or int8 (bool), or a list of str.
+
+    Raises
+    ------
+    ValueError
+        A column is not in the headers, or has an unknown type.
+    ImportError
+        `use_numpy` is True, but numpy is not installed.
+    """
+    use_numpy = _check_numpy(use_numpy)
+    reader = csv.reader(file_in)
+    specs = column_specs(next(reader, []), schema)
+    while True:
+        rows = list(islice(reader, batch_size))
+        if not rows:
+            return
+        batch = _convert_batch(rows, specs)
+        if use_numpy:
+            batch = {name: _to_numpy(column) for name, column in batch.items()}
+        yield batch
+
+
+def read_columns(
+    file_in: TextIO,
+    schema: Mapping[str, str],
+    use_numpy: Optional[bool] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Read whole columns of a csv file, see `read_column_batches`.
+
+    Batches are appended to one `array.array` per column, so only one batch of
+    rows is held as strings at a time.
+    """
+    use_numpy = _check_numpy(use_numpy)
+    columns: Dict[str, Any] = {}
+    for batch in read_column_batches(file_in, schema, batch_size, use_numpy=False):
+        for name, column in batch.items():
+            if name in columns:
+                columns[name].extend(column)
+            else:
+                columns[name] = column
+    for name, type_name in schema.items():
+        if name not in columns:
+            typecode = COLUMN_TYPES[type_name][0]
+            columns[name] = [] if typecode is None else array(typecode)
+    if use_numpy:
+        columns = {name: _to_numpy(column) for name, column in columns.items()}
+    return columns
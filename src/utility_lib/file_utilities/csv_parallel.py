@@ -0,0 +1,245 @@
+"""
+Parse large csv files in parallel, in chunks, across a process pool.
+
+The file is split into byte ranges that end on record boundaries, and each
+range is parsed by a new `RecordReader` in a worker process:
+
+    for order in read_records_parallel(path, MarketOrderSchemaReader):
+        ...
+
+A newline ends a record only if it comes after an even number of quotes, as
+quotes inside quoted fields are doubled, so records with quoted newlines are
+never split. Finding the boundaries counts quotes over the whole file, which
+is much quicker than parsing it. The file must be in an encoding where a
+newline byte is always a newline, like utf8 or latin-1.
+"""
+import csv
+import io
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from itertools import chain
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Generator, List, Optional, Sequence, Tuple
+
+from utility_lib.file_utilities.csv_utililities import RecordReader
+
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+BLOCK_SIZE = 1024 * 1024
+
+
+def next_record_boundary(
+    file_in: BinaryIO, target: int, start: int = 0, quotes_before_start: int = 0
+) -> Tuple[int, int]:
+    """
+    The offset just after the first newline at or after `target` that ends a
+    record, or the end of the file.
+
+    Parameters
+    ----------
+    file_in : BinaryIO
+        The file, opened in binary mode.
+    target : int
+        Offset to search from.
+    start : int, optional
+        A known record boundary at or before `target`, by default 0
+    quotes_before_start : int, optional
+        Quotes before `start`, by default 0. Only their parity matters.
+
+    Returns
+    -------
+    Tuple[int, int]
+        The boundary, and the number of quotes before it.
+    """
+    file_in.seek(start)
+    quotes = quotes_before_start
+    position = start
+    while True:
+        block = file_in.read(BLOCK_SIZE)
+        if not block:
+            return position, quotes
+        search_from = max(target - position, 0)
+        counted = 0
+        while search_from < len(block):
+            newline = block.find(b"\n", search_from)
+            if newline == -1:
+                break
+            quotes += block.count(b'"', counted, newline)
+            counted = newline
+            if quotes % 2 == 0:
+                return position + newline + 1, quotes
+            search_from = newline + 1
+        quotes += block.count(b'"', counted)
+        position += len(block)
+
+
+def chunk_boundaries(
+    file_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, skip_first_record=True
+) -> List[Tuple[int, int]]:
+    """
+    Split a csv file into byte ranges of about `chunk_size` bytes, each ending
+    on a record boundary.
+
+    Parameters
+    ----------
+    file_path : Path
+        The csv file.
+    chunk_size : int, optional
+        Bytes in each chunk, by default 16MiB
+    skip_first_record : bool, optional
+        Start the first chunk after the first record, the headers,
+        by default True
+
+    Returns
+    -------
+    List[Tuple[int, int]]
+        (start, end) offsets of each chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+    size = file_path.stat().st_size
+    chunks = []
+    with file_path.open("rb") as file_in:
+        start, quotes = 0, 0
+        if skip_first_record:
+            start, quotes = next_record_boundary(file_in, 0)
+        while start < size:
+            end, quotes = next_record_boundary(
+                file_in, start + chunk_size - 1, start, quotes
+            )
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def read_headers(file_path: Path, encoding: str = "utf8") -> List[str]:
+    with file_path.open("r", encoding=encoding, newline="") as file_in:
+        return next(csv.reader(file_in), [])
+
+
+def parse_chunk(
+    file_path: Path,
+    start: int,
+    end: int,
+    reader_factory: Callable[[], RecordReader],
+    headers: Optional[Sequence[str]] = None,
+    encoding: str = "utf8",
+) -> List[Any]:
+    """
+    Parse the records between two record boundaries with a new reader.
+
+    `headers` are passed to the reader as the first row, if it reads headers
+    in the first row. Record numbers passed to the reader's record factory
+    count from the start of the chunk.
+    """
+    with file_path.open("rb") as file_in:
+        file_in.seek(start)
+        text = file_in.read(end - start).decode(encoding)
+    record_reader = reader_factory()
+    rows: Any = csv.reader(io.StringIO(text, newline=""))
+    if record_reader.read_headers_in_first_row:
+        rows = chain([headers], rows)
+    return list(record_reader.read_records(rows))
+
+
+def read_chunks_parallel(
+    file_path: Path,
+    reader_factory: Callable[[], RecordReader],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ordered: bool = True,
+    encoding: str = "utf8",
+    executor: Optional[Executor] = None,
+) -> Generator[List[Any], None, None]:
+    """
+    Parse a csv file in chunks across a process pool, yielding the records of
+    each chunk as a list.
+
+    Parameters
+    ----------
+    file_path : Path
+        The csv file.
+    reader_factory : Callable[[], RecordReader]
+        Makes a reader in each worker, e.g. `MarketOrderSchemaReader`, or a
+        `functools.partial` of a reader class. It, and the records, must pickle.
+    workers : Optional[int], optional
+        Worker processes, by default None, one per core.
+    chunk_size : int, optional
+        Bytes in each chunk, by default 16MiB
+    ordered : bool, optional
+        Yield chunks in file order, by default True. If False, yield each
+        chunk as soon as it is parsed.
+    encoding : str, optional
+        Encoding of the file, by default "utf8"
+    executor : Optional[Executor], optional
+        Pool to parse chunks in, by default None, a `ProcessPoolExecutor` of
+        `workers` processes, shut down when the generator finishes.
+
+    Yields
+    -------
+    List[Any]
+        The records in a chunk.
+    """
+    headers_in_first_row = reader_factory().read_headers_in_first_row
+    headers = None
+    if headers_in_first_row:
+        headers = read_headers(file_path, encoding)
+    chunks = iter(chunk_boundaries(file_path, chunk_size, headers_in_first_row))
+    owns_executor = executor is None
+    if executor is None:
+        executor = ProcessPoolExecutor(workers)
+    # enough chunks in flight to keep the pool busy, without reading ahead
+    # of the caller by more than that.
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+    pending: Any = deque()
+    try:
+        while True:
+            while len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(
+                    executor.submit(
+                        parse_chunk,
+                        file_path,
+                        chunk[0],
+                        chunk[1],
+                        reader_factory,
+                        headers,
+                        encoding,
+                    )
+                )
+            if not pending:
+                return
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown(wait=True)
+
+
+def read_records_parallel(
+    file_path: Path,
+    reader_factory: Callable[[], RecordReader],
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ordered: bool = True,
+    encoding: str = "utf8",
+    executor: Optional[Executor] = None,
+) -> Generator[Any, None, None]:
+    """
+    Parse a csv file in chunks across a process pool, yielding each record.
+
+    See `read_chunks_parallel` for parameters.
+    """
+    for records in read_chunks_parallel(
+        file_path, reader_factory, workers, chunk_size, ordered, encoding, executor
+    ):
+        yield from records
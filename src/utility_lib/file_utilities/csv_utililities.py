@@ -13,8 +13,10 @@ Created on Nov 27, 2017
 
 # TODO handle not enough fields, too many fields.
 import csv
+import keyword
 from abc import ABC, abstractmethod
 from collections import namedtuple
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 from typing import (
@@ -23,13 +25,17 @@ from typing import (
     Dict,
     Generator,
     Iterable,
+    Iterator,
     NamedTuple,
     Optional,
     Sequence,
     TextIO,
     Type,
+    Union,
 )
 
+from utility_lib.file_utilities.mapped_file import MappedTextFile
+
 
 @dataclass
 class RemappedHeader:
@@ -87,6 +93,132 @@ class RecordReader(ABC):
             self._headers = [x.data_field for x in self.remapped_headers]
 
 
+@dataclass
+class SchemaField:
+    """
+    A field of a record, and the csv column it is converted from.
+
+    Parameters
+    ----------
+    name : str
+        Keyword argument of the record class.
+    column : Union[str, int, None], optional
+        The column, by header or by index, by default None, the header `name`.
+    converter : Optional[Callable[[str], Any]], optional
+        Converts the string, by default None, keep the string.
+    """
+
+    name: str
+    column: Union[str, int, None] = None
+    converter: Optional[Callable[[str], Any]] = None
+
+
+def make_schema_record_factory(
+    record_class: Callable[..., Any],
+    schema: Sequence[SchemaField],
+    headers: Sequence[str] = (),
+) -> Callable[[int, Sequence[str]], Any]:
+    """
+    Generate a record factory that converts each field straight from its column
+    and calls `record_class` with them, with no intermediate dict.
+
+    The factory is compiled once, with the column indexes as constants and
+    the converters as locals, so a row costs one call per converter and one
+    call to `record_class`.
+
+    Parameters
+    ----------
+    record_class : Callable[..., Any]
+        Takes the fields as keyword arguments, e.g. a dataclass.
+    schema : Sequence[SchemaField]
+        The fields of the record.
+    headers : Sequence[str], optional
+        Headers for columns given by name, by default ()
+
+    Returns
+    -------
+    Callable[[int, Sequence[str]], Any]
+        `record_factory(line_no, record)`, as used by `RecordReader`.
+
+    Raises
+    ------
+    ValueError
+        A field name is not an identifier, or a column is not in `headers`.
+    """
+    headers = list(headers)
+    namespace: Dict[str, Any] = {"_record_class": record_class}
+    arguments = []
+    for number, field in enumerate(schema):
+        if not field.name.isidentifier() or keyword.iskeyword(field.name):
+            raise ValueError(f"Field name {field.name!r} is not an identifier.")
+        column = field.name if field.column is None else field.column
+        if isinstance(column, int):
+            index = column
+        else:
+            try:
+                index = headers.index(column)
+            except ValueError:
+                raise ValueError(f"Column {column!r} is not in the headers.") from None
+        value = f"record[{index}]"
+        if field.converter is not None:
+            converter_name = f"_convert_{number}"
+            namespace[converter_name] = field.converter
+            value = f"{converter_name}({value})"
+        arguments.append(f"{field.name}={value}")
+    defaults = "".join(f", {name}={name}" for name in namespace)
+    source = (
+        f"def record_factory(line_no, record{defaults}):\n"
+        f"    return _record_class({', '.join(arguments)})\n"
+    )
+    exec(source, namespace)  # pylint: disable=exec-used
+    return namespace["record_factory"]
+
+
+class SchemaRecordReader(RecordReader):
+    """
+    Reads records of `record_class`, converting each field as set out in
+    `schema`, with a record factory generated for each file's headers.
+
+    Columns in `schema` are found by the headers in the file, or by the
+    `file_field`s of `remapped_headers` if the file has no header row.
+
+    Parameters
+    ----------
+    record_class : Callable[..., Any]
+        Takes the fields as keyword arguments, e.g. a dataclass.
+    schema : Sequence[SchemaField]
+        The fields of the record.
+    read_headers_in_first_row : bool, optional
+        by default True
+    remapped_headers : Optional[Sequence[RemappedHeader]], optional
+        by default None
+    """
+
+    def __init__(
+        self,
+        record_class: Callable[..., Any],
+        schema: Sequence[SchemaField],
+        read_headers_in_first_row: bool = True,
+        remapped_headers: Optional[Sequence[RemappedHeader]] = None,
+    ):
+        self.record_class = record_class
+        self.schema = schema
+        super().__init__(
+            read_headers_in_first_row=read_headers_in_first_row,
+            remapped_headers=remapped_headers,
+        )
+
+    def _init_record_factory(self, record) -> Callable[[int, Sequence[str]], Any]:
+        # schema columns are file headers, so find them before remapping.
+        if self.read_headers_in_first_row:
+            self._headers = record
+        elif self.remapped_headers:
+            self._headers = [x.file_field for x in self.remapped_headers]
+        file_headers = self._headers
+        self._remap_headers()
+        return make_schema_record_factory(self.record_class, self.schema, file_headers)
+
+
 class RecordWriter(ABC):
     def __init__(
         self,
@@ -279,12 +411,75 @@ def write_record_to_csv(
     return total_count + 1
 
 
-def read_records_from_file(file_path: Path, record_reader: RecordReader):
-    data = []
-    with file_path.open("r") as file_in:
-        csv_reader = csv.reader(file_in)
-        data = [x for x in record_reader.read_records(csv_reader)]
-    return data
+def read_records_from_file(
+    file_path: Path, record_reader: RecordReader, use_mmap: bool = False
+):
+    """
+    Read every record in a csv file into a list.
+
+    Use `iter_records_from_file` or `open_records` to read large files one
+    record at a time.
+    """
+    return list(iter_records_from_file(file_path, record_reader, use_mmap=use_mmap))
+
+
+def iter_records_from_file(
+    file_path: Path,
+    record_reader: RecordReader,
+    encoding: str = "utf8",
+    use_mmap: bool = False,
+) -> Generator[Any, None, None]:
+    """
+    Yield the records in a csv file one at a time, so memory use stays flat.
+
+    The file stays open until the generator is exhausted or closed.
+
+    Parameters
+    ----------
+    file_path : Path
+        The csv file.
+    record_reader : RecordReader
+        Turns each row into a record.
+    encoding : str, optional
+        Encoding of the file, by default "utf8"
+    use_mmap : bool, optional
+        Read the file through a `MappedTextFile`, which saves read calls and
+        copies for large local files, by default False
+
+    Yields
+    -------
+    Any
+        Records made by `record_reader`.
+    """
+    if use_mmap:
+        with MappedTextFile(file_path, encoding) as mapped:
+            yield from record_reader.read_records(csv.reader(mapped.lines()))
+    else:
+        with file_path.open("r", encoding=encoding, newline="") as file_in:
+            yield from record_reader.read_records(csv.reader(file_in))
+
+
+@contextmanager
+def open_records(
+    file_path: Path,
+    record_reader: RecordReader,
+    encoding: str = "utf8",
+    use_mmap: bool = False,
+) -> Iterator[Iterator[Any]]:
+    """
+    Open a csv file as an iterator of records, closing it on leaving the block.
+
+        with open_records(path, MarketOrderRecordReader()) as orders:
+            for order in orders:
+                ...
+
+    See `iter_records_from_file` for parameters.
+    """
+    records = iter_records_from_file(file_path, record_reader, encoding, use_mmap)
+    try:
+        yield records
+    finally:
+        records.close()
 
 
 #################################################################################
@@ -421,11 +616,17 @@ def write_list_to_csv(
 
 
 def read_csv_to_row_factory(
-    file_in: TextIO,
+    file_in: Union[TextIO, Iterable[str]],
     row_factory: Callable[[Sequence[str], dict], Any],
     headers_in_first_row: bool = True,
     context: Optional[dict] = None,
 ) -> Generator[Any, None, None]:
+    """
+    Read csv rows with the factory made by `row_factory(headers, context)`.
+
+    `file_in` is a file opened with `newline=""`, or any iterable of lines,
+    like `MappedTextFile.lines()`.
+    """
     if context is None:
         context = {}
     reader = csv.reader(file_in)
@@ -434,7 +635,7 @@ def read_csv_to_row_factory(
     else:
         headers = []
     factory = row_factory(headers, context)
-    return (factory(*row) for row in reader)
+    return (factory(row) for row in reader)
 
 
 def named_tuple_factory(headers, context):
@@ -7,6 +7,8 @@ from utility_lib.file_utilities.csv_utililities import (
     RecordReader,
     RecordWriter,
     RemappedHeader,
+    SchemaField,
+    SchemaRecordReader,
 )
 
 
@@ -93,6 +95,58 @@ def make_remapped_headers():
     return [RemappedHeader(*x) for x in zip(file_headers, object_headers)]
 
 
+def parse_bool(value: str) -> bool:
+    return bool(strtobool(value))
+
+
+def parse_issued(value: str) -> datetime:
+    """
+    Parse an ESI timestamp, e.g. 2019-12-01T10:49:59Z, by position, which is
+    much quicker than `datetime.strptime`.
+    """
+    if len(value) != 20 or value[4] != "-" or value[10] != "T" or value[19] != "Z":
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+    return datetime(
+        int(value[0:4]),
+        int(value[5:7]),
+        int(value[8:10]),
+        int(value[11:13]),
+        int(value[14:16]),
+        int(value[17:19]),
+    )
+
+
+MARKET_ORDER_SCHEMA = (
+    SchemaField("duration", "duration", int),
+    SchemaField("is_buy_order", "is_buy_order", parse_bool),
+    SchemaField("issued", "issued", parse_issued),
+    SchemaField("location_id", "location_id", int),
+    SchemaField("min_volume", "min_volume", int),
+    SchemaField("order_id", "order_id", int),
+    SchemaField("price", "price", float),
+    SchemaField("range_", "range"),
+    SchemaField("system_id", "system_id", int),
+    SchemaField("type_id", "type_id", int),
+    SchemaField("volume_remain", "volume_remain", int),
+    SchemaField("volume_total", "volume_total", int),
+)
+
+
+class MarketOrderSchemaReader(SchemaRecordReader):
+    """
+    Reads `MarketOrder`s by header with `MARKET_ORDER_SCHEMA`, so columns may
+    be in any order.
+    """
+
+    def __init__(self, read_headers_in_first_row=True, remapped_headers=None):
+        super().__init__(
+            MarketOrder,
+            MARKET_ORDER_SCHEMA,
+            read_headers_in_first_row=read_headers_in_first_row,
+            remapped_headers=remapped_headers,
+        )
+
+
 class MarketOrderRecordReader(RecordReader):
     def __init__(self, read_headers_in_first_row=True, remapped_headers=None):
         super().__init__(
@@ -0,0 +1,116 @@
+"""
+Read large local files as text through a memory map.
+
+A `MappedTextFile` maps the file once and decodes it a block at a time as its
+lines are read. Blocks are decoded straight from the mapped pages, with no
+read calls and no copy into a read buffer, and the file can be scanned again
+without reopening it:
+
+    with MappedTextFile(path) as mapped:
+        orders = read_csv_to_row_factory(mapped.lines(), dict_factory)
+        ...
+        types = {row[9] for row in csv.reader(mapped.lines())}
+"""
+import io
+import mmap
+from itertools import chain
+from pathlib import Path
+from typing import Generator, Iterable, Iterator, Optional
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+# line breaks `str.splitlines` splits on, but a file opened with newline="" doesn't.
+OTHER_LINE_BREAKS = ("\v", "\f", "\x1c", "\x1d", "\x1e", "\x85", "\u2028", "\u2029")
+
+
+def split_lines(text: str) -> Iterable[str]:
+    """Split `text` into lines, with their line endings, as newline="" does."""
+    if any(line_break in text for line_break in OTHER_LINE_BREAKS):
+        return io.StringIO(text, newline="")
+    return text.splitlines(True)
+
+
+class MappedTextFile:
+    """
+    A file mapped into memory, read as lines of text.
+
+    Blocks end after a newline byte, so the encoding must be one where a
+    newline byte is always a newline, like utf8 or latin-1. Lines are split
+    as by a file opened with `newline=""`, as the csv module expects.
+
+    Parameters
+    ----------
+    file_path : Path
+        The file to map.
+    encoding : str, optional
+        Encoding of the file, by default "utf8"
+    block_size : int, optional
+        Bytes decoded at a time, by default 1MiB
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        encoding: str = "utf8",
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ):
+        self.file_path = Path(file_path)
+        self.encoding = encoding
+        self.block_size = block_size
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+    def open(self):
+        if self._file is not None:
+            return
+        self._file = self.file_path.open("rb")
+        # an empty file can't be mapped.
+        if self.file_path.stat().st_size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def blocks(self) -> Generator[str, None, None]:
+        """The file as text, in blocks of whole lines."""
+        if self._file is None:
+            raise ValueError(f"{self.file_path} is not open.")
+        mapped = self._map
+        if mapped is None:
+            return
+        size = len(mapped)
+        start = 0
+        while start < size:
+            end = min(start + self.block_size, size)
+            if end < size:
+                cut = mapped.rfind(b"\n", start, end)
+                if cut == -1:
+                    # a line longer than a block.
+                    cut = mapped.find(b"\n", end)
+                end = size if cut == -1 else cut + 1
+            yield self._decode(mapped, start, end)
+            start = end
+
+    def _decode(self, mapped: mmap.mmap, start: int, end: int) -> str:
+        # views must be released before the map can be closed.
+        with memoryview(mapped) as view, view[start:end] as block:
+            return str(block, self.encoding)
+
+    def lines(self) -> Iterator[str]:
+        """The lines of the file, with their line endings, from the start."""
+        return chain.from_iterable(map(split_lines, self.blocks()))
+
+    def __iter__(self):
+        return self.lines()
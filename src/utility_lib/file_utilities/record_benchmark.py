@@ -0,0 +1,125 @@
+"""
+Compare the record readers on market order csv data.
+
+    python -m utility_lib.file_utilities.record_benchmark --rows 200000
+
+Parses the same rows with each reader, and reports the best time of
+`--repeat` runs and rows per second. Rows are parsed from memory, so the
+figures leave out disk reads.
+"""
+import argparse
+import csv
+import io
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from utility_lib.file_utilities.csv_utililities import (
+    DictRecordReader,
+    RecordReader,
+    TupleRecordReader,
+)
+from utility_lib.file_utilities.eve_market_orders import (
+    MarketOrderRecordReader,
+    MarketOrderSchemaReader,
+)
+
+READERS: Dict[str, Callable[[], RecordReader]] = {
+    "tuple": TupleRecordReader,
+    "dict": DictRecordReader,
+    "market_order": MarketOrderRecordReader,
+    "market_order_schema": MarketOrderSchemaReader,
+}
+
+SAMPLE_ROWS = [
+    "duration,is_buy_order,issued,location_id,min_volume,order_id,price,range,"
+    "system_id,type_id,volume_remain,volume_total",
+    "90,False,2019-12-01T10:49:59Z,60004099,1,5554953115,1.0,region,30002779,"
+    "14021,1000,1000",
+    "90,True,2019-12-12T14:57:22Z,60004327,1,5562948518,0.03,40,30002751,266,"
+    "1000,1000",
+    "365,True,2019-12-12T22:29:48Z,60000322,1,911203378,120.73,station,30002744,"
+    "3673,70376,70376",
+]
+
+
+def make_csv_text(rows: int, source: Optional[Path] = None) -> str:
+    """`rows` rows of market orders after a header row, repeating `source`."""
+    if source is None:
+        lines = SAMPLE_ROWS
+    else:
+        lines = source.read_text(encoding="utf8").splitlines()
+    header, body = lines[0], lines[1:]
+    repeated = [body[x % len(body)] for x in range(rows)]
+    return "\n".join([header] + repeated) + "\n"
+
+
+def time_reader(
+    reader_factory: Callable[[], RecordReader], text: str, repeat: int = 3
+) -> float:
+    """Best time, in seconds, to read every record in `text`."""
+    best = None
+    for _ in range(repeat):
+        reader = reader_factory()
+        start = time.perf_counter()
+        for _ in reader.read_records(csv.reader(io.StringIO(text, newline=""))):
+            pass
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best  # type: ignore
+
+
+def run_benchmarks(
+    rows: int,
+    repeat: int = 3,
+    readers: Optional[Sequence[str]] = None,
+    source: Optional[Path] = None,
+) -> List[Dict[str, float]]:
+    if readers is None:
+        readers = list(READERS)
+    text = make_csv_text(rows, source)
+    results = []
+    for name in readers:
+        seconds = time_reader(READERS[name], text, repeat)
+        results.append(
+            {"reader": name, "seconds": seconds, "rows_per_second": rows / seconds}
+        )
+    return results
+
+
+def format_results(results: Sequence[Dict[str, float]]) -> List[str]:
+    width = max(len("reader"), *(len(str(x["reader"])) for x in results))
+    lines = [f"{'reader':<{width}}  {'seconds':>9}  {'rows/s':>12}"]
+    for result in results:
+        lines.append(
+            f"{result['reader']:<{width}}  {result['seconds']:>9.3f}"
+            f"  {result['rows_per_second']:>12.0f}"
+        )
+    return lines
+
+
+def parse_args(args: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--readers", nargs="+", choices=list(READERS), default=list(READERS)
+    )
+    parser.add_argument(
+        "--source", type=Path, default=None, help="csv file of rows to repeat"
+    )
+    return parser.parse_args(args)
+
+
+def main(args: Optional[Sequence[str]] = None):
+    options = parse_args(args)
+    results = run_benchmarks(
+        options.rows, options.repeat, options.readers, options.source
+    )
+    for line in format_results(results):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,26 @@
 import asyncio
+import os
+import signal
+from contextlib import asynccontextmanager
 
 from pathlib import Path
 
 # import aiohttp
 import pytest
+from aiohttp import test_utils, web
 
 from utility_lib.async_utilities.async_queue import (
+    ActionOutcome,
+    ConnectorConfig,
     ExampleAction,
     HttpAction,
+    QueueAction,
     HttpQueueRunner,
+    OutcomeStatus,
+    PaginationPlanner,
+    PriorityFeedQueue,
     QueueRunner,
+    SessionPool,
     basic_worker,
     check_for_pages,
     print_page_number,
@@ -19,8 +30,12 @@ from utility_lib.async_utilities.async_queue import (
     save_response,
     save_response_to_csv,
     save_response_to_json,
+    make_deadline,
+    make_page_action,
     store_page_text,
+    stream_response_to_file,
 )
+from utility_lib.async_utilities.retry import RetryPolicy
 
 # from tests.asyncQueueRunner import market_history as MH
 
@@ -28,8 +43,8 @@ from utility_lib.async_utilities.async_queue import (
 def test_basic_runner():
     actions = []
 
-    for _ in range(20):
-        action = ExampleAction(x)
+    for x in range(20):
+        action = ExampleAction(str(x))
         actions.append(action)
 
     runner = QueueRunner(basic_worker)
@@ -37,6 +52,566 @@ def test_basic_runner():
     assert len(actions) == 20
 
 
+class QueueDepthAction(QueueAction):
+    async def do_action(self, queue):
+        self.context["depths"].append(queue.qsize())
+        await asyncio.sleep(0.001)
+
+
+def test_basic_runner_bounded_feed():
+    context: dict = {"depths": []}
+    pulled = []
+
+    async def action_source():
+        for x in range(200):
+            pulled.append(x)
+            yield QueueDepthAction(str(x), context)
+
+    runner = QueueRunner(basic_worker)
+    asyncio.run(runner.do_queue(action_source(), 4, maxsize=8))
+    assert len(pulled) == 200
+    assert len(context["depths"]) == 200
+    assert max(context["depths"]) < 8
+
+
+class SleepAction(QueueAction):
+    async def do_action(self, queue):
+        sleep_for = self.context["sleep_for"]
+        if sleep_for < 0:
+            raise ValueError("Can't sleep for negative time.")
+        await asyncio.sleep(sleep_for)
+        return sleep_for
+
+
+def test_queue_runner_outcomes():
+    actions = [SleepAction(str(x), {"sleep_for": x / 100}) for x in (5, -1, 1)]
+    outcomes = asyncio.run(QueueRunner().do_queue(actions, 3))
+    assert [x.action.name for x in outcomes] == ["-1", "1", "5"]
+    assert [x.status for x in outcomes] == [
+        OutcomeStatus.FAILED,
+        OutcomeStatus.SUCCESS,
+        OutcomeStatus.SUCCESS,
+    ]
+    assert isinstance(outcomes[0].error, ValueError)
+    assert [x.result for x in outcomes[1:]] == [0.01, 0.05]
+    assert outcomes[2].latency >= 0.05
+
+
+def test_queue_runner_same_action_twice():
+    action = SleepAction("twice", {"sleep_for": 0.01})
+
+    async def run():
+        return await asyncio.wait_for(QueueRunner().do_queue([action, action], 2), 5)
+
+    outcomes = asyncio.run(run())
+    assert [x.status for x in outcomes] == [OutcomeStatus.SUCCESS] * 2
+
+
+def test_queue_runner_old_style_workers():
+    async def worker(queue):
+        while True:
+            job = await queue.get()
+            await job.do_action(queue)
+            queue.task_done()
+
+    async def http_worker_without_context(queue, session):
+        assert session is not None
+        await worker(queue)
+
+    async def worker_with_option(queue, verbose=False):
+        assert verbose is False
+        await worker(queue)
+
+    actions = [SleepAction(str(x), {"sleep_for": 0.001}) for x in range(3)]
+    asyncio.run(QueueRunner(worker=worker).do_queue(actions, 2))
+    asyncio.run(QueueRunner(worker=worker_with_option).do_queue(actions, 2))
+    asyncio.run(
+        HttpQueueRunner(worker=http_worker_without_context).do_queue(actions, 2)
+    )
+
+
+def test_queue_runner_iter_queue():
+    pulled = []
+
+    def action_source():
+        for x in range(10):
+            pulled.append(x)
+            yield SleepAction(str(x), {"sleep_for": x / 100})
+
+    async def run():
+        seen = []
+        async for outcome in QueueRunner().iter_queue(action_source(), 4, maxsize=2):
+            assert isinstance(outcome, ActionOutcome)
+            seen.append((outcome.action.name, len(pulled)))
+        return seen
+
+    seen = asyncio.run(run())
+    assert sorted(int(x[0]) for x in seen) == list(range(10))
+    # outcomes arrive while later actions are still waiting to be pulled.
+    assert seen[0][1] < 10
+
+
+def test_priority_feed_queue_order():
+    async def run():
+        queue = PriorityFeedQueue()
+        for name, priority, deadline in [
+            ("low", 5, None),
+            ("fed", 0, None),
+            ("soon", 0, 10.0),
+            ("first", -1, None),
+        ]:
+            await queue.feed(SleepAction(name, {"sleep_for": 0}, priority, deadline))
+        # put back by a worker, so ahead of fed actions of the same priority.
+        queue.put_nowait(SleepAction("retry", {"sleep_for": 0}))
+        return [queue.get_nowait().name for _ in range(queue.qsize())]
+
+    assert asyncio.run(run()) == ["first", "soon", "retry", "fed", "low"]
+
+
+def test_queue_runner_prioritise_and_expire():
+    started = []
+
+    class RecordingAction(SleepAction):
+        async def do_action(self, queue):
+            started.append(self.name)
+            return await super().do_action(queue)
+
+    actions = [
+        RecordingAction(str(x), {"sleep_for": 0.001}, priority=-x) for x in range(5)
+    ]
+    actions.append(
+        RecordingAction("late", {"sleep_for": 0}, deadline=make_deadline(-1))
+    )
+    outcomes = asyncio.run(QueueRunner(prioritise=True).do_queue(actions, 1))
+    assert started == ["4", "3", "2", "1", "0"]
+    expired = [x for x in outcomes if x.status is OutcomeStatus.EXPIRED]
+    assert [x.action.name for x in expired] == ["late"]
+    assert expired[0].attempts == 0
+
+
+def test_queue_runner_action_timeout():
+    actions = [SleepAction(str(x), {"sleep_for": x}) for x in (0, 5)]
+    runner = QueueRunner(action_timeout=0.05)
+    outcomes = asyncio.run(runner.do_queue(actions, 2))
+    assert [x.status for x in outcomes] == [
+        OutcomeStatus.SUCCESS,
+        OutcomeStatus.FAILED,
+    ]
+    assert isinstance(outcomes[1].error, asyncio.TimeoutError)
+
+
+def test_queue_runner_timeout():
+    actions = [SleepAction(str(x), {"sleep_for": 0.5}) for x in range(10)]
+    runner = QueueRunner()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        outcomes = await runner.do_queue(actions, 2, timeout=0.05)
+        return outcomes, loop.time() - start
+
+    outcomes, elapsed = asyncio.run(run())
+    assert outcomes == []
+    assert elapsed < 0.4
+    # the two running actions, then the eight still queued.
+    assert runner.unfinished == actions
+
+
+def sleep_actions():
+    for x in range(1000):
+        yield SleepAction(str(x), {"sleep_for": 0.005})
+
+
+def test_queue_runner_stop():
+    async def run(drain):
+        runner = QueueRunner()
+        outcomes = []
+
+        async def stop_after(outcome):
+            outcomes.append(outcome)
+            if len(outcomes) == 5:
+                runner.stop(drain=drain)
+
+        await runner.run_queue(sleep_actions(), 2, 4, stop_after)
+        return outcomes, runner.unfinished
+
+    # draining finishes the queued actions, but takes no new ones.
+    outcomes, unfinished = asyncio.run(run(True))
+    assert 5 < len(outcomes) <= 12
+    assert unfinished == []
+    # both workers can finish in the same step.
+    outcomes, unfinished = asyncio.run(run(False))
+    assert 5 <= len(outcomes) <= 6
+    assert 0 < len(unfinished) <= 6
+    assert not {x.action for x in outcomes} & set(unfinished)
+
+
+def test_queue_runner_handles_signals():
+    async def run():
+        runner = QueueRunner()
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, os.kill, os.getpid(), signal.SIGINT)
+        outcomes = await runner.do_queue(
+            sleep_actions(), 2, maxsize=4, handle_signals=True
+        )
+        return outcomes, runner.unfinished
+
+    outcomes, unfinished = asyncio.run(run())
+    assert 0 < len(outcomes) < 1000
+    assert unfinished == []
+
+
+@asynccontextmanager
+async def local_server(app: web.Application):
+    server = test_utils.TestServer(app)
+    await server.start_server()
+    try:
+        yield server
+    finally:
+        await server.close()
+
+
+def test_http_runner_max_requests_per_host():
+    in_flight = {"now": 0, "max": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        return web.json_response({"page": request.query["page"]})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/data", handler)
+        async with local_server(app) as server:
+            actions = [
+                HttpAction(
+                    "GET",
+                    str(server.make_url("/data")),
+                    request_params={"page": x},
+                    response_handlers=[process_response_to_json],
+                )
+                for x in range(30)
+            ]
+            runner = HttpQueueRunner(
+                connector_config=ConnectorConfig(limit=10, keepalive_timeout=5),
+                max_requests_per_host=3,
+            )
+            await runner.do_queue(actions, 10)
+            return actions
+
+    actions = asyncio.run(run())
+    assert [x.context["response_data"]["page"] for x in actions] == [
+        str(x) for x in range(30)
+    ]
+    assert in_flight["max"] == 3
+
+
+def test_stream_response_to_file(tmp_path):
+    body = bytes(range(256)) * 4096
+
+    async def handler(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for x in range(0, len(body), 10000):
+            await response.write(body[x : x + 10000])
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/dump", handler)
+        async with local_server(app) as server:
+            action = HttpAction(
+                "GET",
+                str(server.make_url("/dump")),
+                response_handlers=[stream_response_to_file],
+                context={"save_path": tmp_path / "dumps" / "dump.bin"},
+            )
+            await HttpQueueRunner().do_queue([action], 1)
+
+    asyncio.run(run())
+    assert (tmp_path / "dumps" / "dump.bin").read_bytes() == body
+    assert list((tmp_path / "dumps").iterdir()) == [tmp_path / "dumps" / "dump.bin"]
+
+
+def test_http_runner_outcomes():
+    calls = []
+
+    async def flaky(request):
+        calls.append(1)
+        if len(calls) == 1:
+            return web.Response(status=503)
+        return web.json_response({"ok": True})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/flaky", flaky)
+        async with local_server(app) as server:
+            actions = [
+                HttpAction(
+                    "GET",
+                    str(server.make_url(path)),
+                    response_handlers=[process_response_to_json],
+                )
+                for path in ("/flaky", "/missing")
+            ]
+            runner = HttpQueueRunner(retry_policy=RetryPolicy(base_delay=0.01))
+            return await runner.do_queue(actions, 2)
+
+    outcomes = asyncio.run(run())
+    outcomes.sort(key=lambda x: x.action.url)
+    assert [x.status for x in outcomes] == [
+        OutcomeStatus.SUCCESS,
+        OutcomeStatus.FAILED,
+    ]
+    assert [x.http_status for x in outcomes] == [200, 404]
+    assert [x.attempts for x in outcomes] == [2, 1]
+    assert outcomes[0].result == {"ok": True}
+
+
+def test_http_runner_request_timeout():
+    calls = []
+
+    async def slow_once(request):
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return web.json_response({"ok": True})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/slow", slow_once)
+        async with local_server(app) as server:
+            action = HttpAction(
+                "GET",
+                str(server.make_url("/slow")),
+                response_handlers=[process_response_to_json],
+            )
+            runner = HttpQueueRunner(
+                retry_policy=RetryPolicy(base_delay=0.01), request_timeout=0.1
+            )
+            return await runner.do_queue([action], 1)
+
+    outcomes = asyncio.run(run())
+    assert [x.status for x in outcomes] == [OutcomeStatus.SUCCESS]
+    assert outcomes[0].attempts == 2
+
+
+def counting_app():
+    in_flight = {"now": 0, "max": 0}
+
+    async def handler(request):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_get("/count", handler)
+    return app, in_flight
+
+
+def count_actions(server, count):
+    return [
+        HttpAction(
+            "GET",
+            str(server.make_url("/count")),
+            request_params={"n": n},
+            response_handlers=[process_response_to_json],
+        )
+        for n in range(count)
+    ]
+
+
+def test_http_runner_shards_sessions():
+    async def run(sessions):
+        app, in_flight = counting_app()
+        async with local_server(app) as server:
+            runner = HttpQueueRunner(
+                connector_config=ConnectorConfig(limit=1), sessions=sessions
+            )
+            outcomes = await runner.do_queue(count_actions(server, 8), 4)
+        assert all(x.status is OutcomeStatus.SUCCESS for x in outcomes)
+        return in_flight["max"]
+
+    # each session has its own pool of one connection.
+    assert asyncio.run(run(1)) == 1
+    assert asyncio.run(run(2)) == 2
+
+
+def test_session_pool_per_host():
+    async def run():
+        pool = SessionPool(per_host=True)
+        async with pool:
+            first = pool.session(url="http://a.example/x")
+            assert pool.session(url="http://a.example/y") is first
+            assert pool.session(url="http://b.example/x") is not first
+            assert len(pool.host_sessions) == 2
+            sessions = list(pool.host_sessions.values())
+        assert pool.host_sessions == {}
+        assert all(session.closed for session in sessions)
+
+    asyncio.run(run())
+
+
+def test_http_runner_reuses_sessions():
+    async def run():
+        app, _ = counting_app()
+        async with local_server(app) as server:
+            async with HttpQueueRunner(sessions=2) as runner:
+                sessions = list(runner.session_pool.sessions)
+                for _ in range(2):
+                    outcomes = await runner.do_queue(count_actions(server, 4), 2)
+                    assert len(outcomes) == 4
+                    assert runner.session_pool.sessions == sessions
+                    assert not any(session.closed for session in sessions)
+            assert runner.session_pool is None
+            assert all(session.closed for session in sessions)
+
+            pool = SessionPool(per_host=True)
+            async with pool:
+                runner = HttpQueueRunner(session_pool=pool)
+                await runner.do_queue(count_actions(server, 2), 2)
+                assert len(pool.host_sessions) == 1
+                assert not pool.sessions[0].closed
+
+    asyncio.run(run())
+
+
+def paginated_app(page_counts, page_delay=0.0):
+    requests = []
+
+    async def handler(request):
+        page = int(request.query["page"])
+        requests.append((page, asyncio.get_running_loop().time()))
+        if page == 1:
+            await asyncio.sleep(page_delay)
+        return web.json_response(
+            [{"page": page}], headers={"x-pages": str(page_counts[0])}
+        )
+
+    app = web.Application()
+    app.router.add_get("/orders", handler)
+    return app, requests
+
+
+def first_page_action(server, handlers):
+    return HttpAction(
+        "GET",
+        str(server.make_url("/orders")),
+        request_params={"page": 1, "order_type": "all"},
+        response_handlers=handlers,
+        context={"pages": {}},
+    )
+
+
+def test_make_page_action_keeps_priority():
+    action = HttpAction(
+        "GET",
+        "http://example.com/orders",
+        request_params={"page": 1},
+        priority=-5,
+        deadline=123.0,
+    )
+    page = make_page_action(action, 2)
+    assert page.request_params == {"page": 2}
+    assert (page.priority, page.deadline) == (-5, 123.0)
+
+
+def test_check_for_pages():
+    async def run():
+        app, requests = paginated_app([4])
+        async with local_server(app) as server:
+            action = first_page_action(server, [check_for_pages, store_page_text])
+            await HttpQueueRunner().do_queue([action], 3)
+        return action, requests
+
+    action, requests = asyncio.run(run())
+    assert sorted(x[0] for x in requests) == [1, 2, 3, 4]
+    assert sorted(action.context["pages"]) == ["1", "2", "3", "4"]
+    assert action.request_params == {"page": 1, "order_type": "all"}
+
+
+def test_pages_are_not_queued_again_after_a_failed_read(tmp_path):
+    requests = []
+
+    async def handler(request):
+        page = int(request.query["page"])
+        requests.append(page)
+        response = web.StreamResponse(headers={"x-pages": "3"})
+        await response.prepare(request)
+        await response.write(b"x" * 1000)
+        if page == 1:
+            # times out part way through the body.
+            await asyncio.sleep(1)
+        await response.write(b"x" * 1000)
+        return response
+
+    async def save_path_provider(action, response, queue):
+        return tmp_path / f"{action.request_params['page']}.bin"
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/orders", handler)
+        async with local_server(app) as server:
+            action = HttpAction(
+                "GET",
+                str(server.make_url("/orders")),
+                request_params={"page": 1},
+                response_handlers=[check_for_pages, stream_response_to_file],
+                context={"save_path_provider": save_path_provider},
+            )
+            runner = HttpQueueRunner(
+                retry_policy=RetryPolicy(base_delay=0.01), request_timeout=0.2
+            )
+            return await runner.do_queue([action], 3)
+
+    outcomes = asyncio.run(run())
+    assert sorted(requests) == [1, 2, 3]
+    statuses = {x.action.request_params["page"]: x.status for x in outcomes}
+    assert statuses == {
+        1: OutcomeStatus.FAILED,
+        2: OutcomeStatus.SUCCESS,
+        3: OutcomeStatus.SUCCESS,
+    }
+    assert (tmp_path / "2.bin").read_bytes() == b"x" * 2000
+
+
+def test_pagination_planner_prefetches_known_pages():
+    page_counts = [3]
+    planner = PaginationPlanner()
+
+    async def poll(server):
+        action = first_page_action(server, [planner.check_for_pages, store_page_text])
+        planned = planner.plan(action)
+        await HttpQueueRunner().do_queue(planned, 5)
+        return action, planned
+
+    async def run():
+        app, requests = paginated_app(page_counts, page_delay=0.1)
+        async with local_server(app) as server:
+            first_poll = await poll(server)
+            page_counts[0] = 4
+            del requests[:]
+            second_poll = await poll(server)
+        return first_poll, second_poll, requests
+
+    first_poll, second_poll, requests = asyncio.run(run())
+    action, planned = first_poll
+    assert len(planned) == 1
+    assert sorted(action.context["pages"]) == ["1", "2", "3"]
+    # second poll starts pages 2 and 3 with page 1, then finds a new page 4.
+    action, planned = second_poll
+    assert [x.request_params["page"] for x in planned] == [1, 2, 3]
+    assert sorted(action.context["pages"]) == ["1", "2", "3", "4"]
+    first_page_time = requests[0][1]
+    assert all(x[1] - first_page_time < 0.05 for x in requests if x[0] in (2, 3))
+    assert [x for x in requests if x[0] == 4][0][1] - first_page_time >= 0.1
+    assert list(planner.page_counts.values()) == [4]
+
+
 def test_get_json():
     actions = []
     url = "https://esi.evetech.net/v1/universe/regions/"
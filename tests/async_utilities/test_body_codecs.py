@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities import body_codecs
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    process_response_to_bytes,
+    process_response_to_json,
+    save_response_to_json,
+)
+from utility_lib.async_utilities.body_codecs import (
+    accept_encoding,
+    dumps_json,
+    loads_json,
+)
+
+DATA = [{"order_id": 1, "price": 5.25, "name": "Tritanium é"}]
+
+
+def test_json_codecs(monkeypatch):
+    encoded = json.dumps(DATA).encode("utf8")
+    assert loads_json(encoded) == DATA
+    assert json.loads(dumps_json(DATA, indent=True)) == DATA
+    fast = dumps_json(DATA)
+    # the standard library fallback gives the same compact output.
+    monkeypatch.setattr(body_codecs, "orjson", None)
+    assert loads_json(encoded) == DATA
+    assert dumps_json(DATA) == fast
+    assert json.loads(dumps_json(DATA, indent=True)) == DATA
+    assert "gzip" in accept_encoding()
+
+
+def test_compressed_responses(tmp_path):
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get("Accept-Encoding"))
+        response = web.json_response(DATA * 200)
+        response.enable_compression()
+        return response
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/orders", handler)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            action = HttpAction(
+                "GET",
+                str(server.make_url("/orders")),
+                response_handlers=[
+                    process_response_to_bytes,
+                    process_response_to_json,
+                    save_response_to_json,
+                ],
+                context={"save_path": tmp_path / "orders.json"},
+            )
+            outcomes = await HttpQueueRunner().do_queue([action], 1)
+        finally:
+            await server.close()
+        return action, outcomes
+
+    action, outcomes = asyncio.run(run())
+    assert seen == [accept_encoding()]
+    assert action.context["response_data"] == DATA * 200
+    assert json.loads(action.context["response_bytes"]) == DATA * 200
+    assert json.loads((tmp_path / "orders.json").read_bytes()) == DATA * 200
+    # the body is counted after it is decompressed.
+    assert outcomes[0].bytes_received == len(action.context["response_bytes"])
@@ -0,0 +1,147 @@
+import asyncio
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    OutcomeStatus,
+    process_response_to_json,
+)
+from utility_lib.async_utilities.coalesce import RequestCoalescer
+from utility_lib.async_utilities.retry import RetryPolicy
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_request_coalescer():
+    async def run():
+        coalescer = RequestCoalescer()
+        assert await coalescer.follow_or_lead("a") is None
+        followers = [
+            asyncio.create_task(coalescer.follow_or_lead("a")) for _ in range(2)
+        ]
+        await settle()
+        assert coalescer.has_followers("a")
+        # the leader failed, so one follower takes over.
+        coalescer.finish("a")
+        await settle()
+        done = [x for x in followers if x.done()]
+        assert [x.result() for x in done] == [None]
+        coalescer.finish("a", "response")
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(run()) == [None, "response"]
+
+
+def run_actions(handler, actions_params, workers):
+    async def run():
+        app = web.Application()
+        app.router.add_get("/orders", handler)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            actions = [
+                HttpAction(
+                    "GET",
+                    str(server.make_url("/orders")),
+                    request_params=params,
+                    response_handlers=[process_response_to_json],
+                )
+                for params in actions_params
+            ]
+            runner = HttpQueueRunner(
+                retry_policy=RetryPolicy(base_delay=0.01), coalesce_requests=True
+            )
+            outcomes = await runner.do_queue(actions, workers)
+        finally:
+            await server.close()
+        return actions, outcomes
+
+    return asyncio.run(run())
+
+
+def test_identical_requests_share_a_response():
+    requests = []
+
+    async def handler(request):
+        requests.append(request.query["region"])
+        await asyncio.sleep(0.05)
+        return web.json_response({"region": request.query["region"]})
+
+    params = [{"region": "1"}] * 5 + [{"region": "2"}]
+    actions, outcomes = run_actions(handler, params, 6)
+    assert sorted(requests) == ["1", "2"]
+    assert all(x.status is OutcomeStatus.SUCCESS for x in outcomes)
+    assert [x.context["response_data"] for x in actions] == [
+        {"region": x["region"]} for x in params
+    ]
+    assert sorted(x.bytes_received > 0 for x in outcomes) == [False] * 4 + [True] * 2
+
+
+def test_followers_take_over_a_failed_request():
+    requests = []
+
+    async def handler(request):
+        requests.append(1)
+        await asyncio.sleep(0.05)
+        if len(requests) == 1:
+            return web.Response(status=503)
+        return web.json_response({"ok": True})
+
+    actions, outcomes = run_actions(handler, [{"region": "1"}] * 4, 4)
+    # the first request failed, a follower led the second.
+    assert len(requests) == 2
+    assert all(x.status is OutcomeStatus.SUCCESS for x in outcomes)
+    assert [x.context["response_data"] for x in actions] == [{"ok": True}] * 4
+
+
+def test_leader_handlers_overlap_the_next_wave():
+    requests = []
+    second_wave = []
+
+    async def handler(request):
+        requests.append(1)
+        await asyncio.sleep(0.05 if len(requests) == 1 else 0.4)
+        return web.json_response({"ok": True})
+
+    async def queue_second_wave(action, response, queue):
+        if not second_wave:
+            second_wave.extend(
+                HttpAction(
+                    "GET", action.url, response_handlers=[process_response_to_json]
+                )
+                for _ in range(2)
+            )
+            for second_action in second_wave:
+                await queue.put(second_action)
+            # the second wave leads the request while this handler runs.
+            await asyncio.sleep(0.2)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/orders", handler)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            actions = [
+                HttpAction(
+                    "GET",
+                    str(server.make_url("/orders")),
+                    response_handlers=[queue_second_wave],
+                )
+                for _ in range(2)
+            ]
+            runner = HttpQueueRunner(coalesce_requests=True)
+            return await runner.do_queue(actions, 4)
+        finally:
+            await server.close()
+
+    outcomes = asyncio.run(run())
+    assert len(requests) == 2
+    assert len(outcomes) == 4
+    assert all(x.status is OutcomeStatus.SUCCESS for x in outcomes)
+    assert [x.context["response_data"] for x in second_wave] == [{"ok": True}] * 2
@@ -0,0 +1,104 @@
+import asyncio
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    OutcomeStatus,
+    QueueAction,
+    QueueRunner,
+)
+from utility_lib.async_utilities.concurrency import AdaptiveConcurrency
+from utility_lib.async_utilities.outcomes import ActionOutcome
+from utility_lib.async_utilities.retry import RetryPolicy
+
+
+def attempt(latency, http_status=200):
+    return ActionOutcome(
+        None, OutcomeStatus.SUCCESS, http_status=http_status, latency=latency
+    )
+
+
+def test_adaptive_concurrency_adjusts_limit():
+    concurrency = AdaptiveConcurrency(initial_limit=8, window=10)
+    concurrency.on_run_start(16)
+    for _ in range(10):
+        concurrency.observe(attempt(0.01))
+    # nobody waited for a slot, so no reason to grow.
+    assert concurrency.limit == 8
+    concurrency._saturated = True
+    for _ in range(10):
+        concurrency.observe(attempt(0.01))
+    assert concurrency.limit == 9
+    # latency well above the best seen.
+    for _ in range(10):
+        concurrency.observe(attempt(0.05))
+    assert concurrency.limit == 6
+    for _ in range(9):
+        concurrency.observe(attempt(0.01))
+    concurrency.observe(attempt(0.01, http_status=429))
+    assert concurrency.limit == 6
+    for _ in range(2):
+        concurrency.observe(attempt(0.01, http_status=503))
+    for _ in range(8):
+        concurrency.observe(attempt(0.01))
+    assert concurrency.limit == 4
+    assert concurrency.limits == [8, 9, 6, 4]
+
+
+class CountingAction(QueueAction):
+    async def do_action(self, queue):
+        stats = self.context["stats"]
+        stats["running"] += 1
+        stats["peak"] = max(stats["peak"], stats["running"])
+        await asyncio.sleep(0.002)
+        stats["running"] -= 1
+
+
+def test_adaptive_concurrency_grows_to_workers():
+    stats = {"running": 0, "peak": 0}
+    concurrency = AdaptiveConcurrency(initial_limit=1, window=5)
+    actions = [CountingAction(str(x), context={"stats": stats}) for x in range(300)]
+    runner = QueueRunner(concurrency=concurrency)
+    outcomes = asyncio.run(runner.do_queue(actions, 8))
+    assert len(outcomes) == 300
+    assert concurrency.limits[:2] == [1, 2]
+    assert max(concurrency.limits) == 8
+    assert stats["peak"] <= 8
+    assert concurrency.in_flight == 0
+
+
+def test_adaptive_concurrency_backs_off_throttling_server():
+    running = []
+
+    async def handler(request):
+        if len(running) >= 3:
+            return web.Response(status=503)
+        running.append(1)
+        try:
+            await asyncio.sleep(0.005)
+        finally:
+            running.pop()
+        return web.Response(text="ok")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/", handler)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            actions = [HttpAction("GET", str(server.make_url("/"))) for _ in range(150)]
+            runner = HttpQueueRunner(
+                retry_policy=RetryPolicy(base_delay=0.001, jitter=0),
+                concurrency=concurrency,
+            )
+            return await runner.do_queue(actions, 16)
+        finally:
+            await server.close()
+
+    concurrency = AdaptiveConcurrency(initial_limit=16, window=10)
+    outcomes = asyncio.run(run())
+    assert all(x.status is OutcomeStatus.SUCCESS for x in outcomes)
+    assert len(outcomes) == 150
+    assert min(concurrency.limits) <= 3
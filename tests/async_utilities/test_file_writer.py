@@ -0,0 +1,80 @@
+import asyncio
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    save_list_of_dicts,
+    save_response,
+    save_response_to_csv,
+    save_string,
+)
+from utility_lib.async_utilities.file_writer import FileWriter
+
+
+def test_file_writer(tmp_path):
+    async def run():
+        async with FileWriter(max_pending=4, batch_size=3, fsync=True) as writer:
+            futures = [
+                await writer.submit(save_string, f"file {x}", tmp_path / f"{x}.txt")
+                for x in range(20)
+            ]
+            futures.append(
+                await writer.submit(
+                    save_list_of_dicts, [{"a": 1, "b": 2}], tmp_path / "data.csv"
+                )
+            )
+        return futures
+
+    futures = asyncio.run(run())
+    assert all(x.result() is True for x in futures)
+    for x in range(20):
+        assert (tmp_path / f"{x}.txt").read_text() == f"file {x}"
+    assert (tmp_path / "data.csv").read_text() == "a,b\n1,2\n"
+
+
+def test_save_handlers_use_file_writer(tmp_path):
+    async def handler(request):
+        return web.json_response([{"page": request.query["page"]}])
+
+    async def save_path_provider(action, response, queue):
+        page = action.request_params["page"]
+        return tmp_path / "pages" / f"{page}.{action.context['suffix']}"
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/data", handler)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            async with FileWriter(max_pending=2) as writer:
+                actions = []
+                for suffix, save_handler in (
+                    ("json", save_response),
+                    ("csv", save_response_to_csv),
+                ):
+                    context = {
+                        "suffix": suffix,
+                        "save_path_provider": save_path_provider,
+                        "file_writer": writer,
+                    }
+                    actions.extend(
+                        HttpAction(
+                            "GET",
+                            str(server.make_url("/data")),
+                            request_params={"page": x},
+                            response_handlers=[save_handler],
+                            context=context,
+                        )
+                        for x in range(10)
+                    )
+                await HttpQueueRunner().do_queue(actions, 4)
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+    for x in range(10):
+        json_text = (tmp_path / "pages" / f"{x}.json").read_text()
+        assert json_text == f'[{{"page": "{x}"}}]'
+        assert (tmp_path / "pages" / f"{x}.csv").read_text() == f"page\n{x}\n"
@@ -0,0 +1,101 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    process_response_to_json,
+)
+from utility_lib.async_utilities.http_cache import HttpCache, cache_key, expiry_time
+
+
+def test_cache_key():
+    key = cache_key("get", "http://host/a", {"page": 1, "type_id": 34})
+    assert key == cache_key("GET", "http://host/a", {"type_id": 34, "page": 1})
+    assert key != cache_key("GET", "http://host/a", {"type_id": 34, "page": 2})
+
+
+def test_expiry_time():
+    expires = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    headers = {"Expires": format_datetime(expires, usegmt=True)}
+    assert expiry_time(headers) == expires.timestamp()
+    assert expiry_time({"Cache-Control": "public, max-age=60"}, now=100) == 160
+    assert expiry_time({"Cache-Control": "no-cache", **headers}) == 0
+    assert expiry_time({}) == 0
+
+
+def run_actions(server_routes, cache_dir, request_count):
+    async def run():
+        app = web.Application()
+        for path, handler in server_routes:
+            app.router.add_get(path, handler)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            actions = []
+            for _ in range(request_count):
+                action = HttpAction(
+                    "GET",
+                    str(server.make_url("/orders")),
+                    request_params={"page": 1},
+                    response_handlers=[process_response_to_json, store_pages],
+                )
+                await HttpQueueRunner(http_cache=HttpCache(cache_dir)).do_queue(
+                    [action], 1
+                )
+                actions.append(action)
+        finally:
+            await server.close()
+        return actions
+
+    return asyncio.run(run())
+
+
+async def store_pages(action, response, queue):
+    action.context["x-pages"] = response.headers.get("x-pages")
+    action.context["from_cache"] = getattr(response, "from_cache", False)
+
+
+def test_etag_revalidation(tmp_path):
+    seen_headers = []
+
+    async def handler(request):
+        seen_headers.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"', "x-pages": "3"})
+        return web.json_response(
+            [{"order_id": 1}], headers={"ETag": '"v1"', "x-pages": "2"}
+        )
+
+    actions = run_actions([("/orders", handler)], tmp_path, 2)
+    assert seen_headers == [None, '"v1"']
+    assert [x.context["response_data"] for x in actions] == [[{"order_id": 1}]] * 2
+    # headers from the 304 replace the cached ones.
+    assert [x.context["x-pages"] for x in actions] == ["2", "3"]
+    assert [x.context["from_cache"] for x in actions] == [True, True]
+
+
+def test_fresh_entries_skip_request(tmp_path):
+    request_count = []
+
+    async def handler(request):
+        request_count.append(1)
+        return web.json_response(
+            {"count": len(request_count)}, headers={"Cache-Control": "max-age=60"}
+        )
+
+    actions = run_actions([("/orders", handler)], tmp_path, 3)
+    assert len(request_count) == 1
+    assert [x.context["response_data"] for x in actions] == [{"count": 1}] * 3
+
+
+def test_uncacheable_responses_are_not_stored(tmp_path):
+    async def handler(request):
+        return web.json_response({"ok": True}, headers={"Cache-Control": "no-store"})
+
+    actions = run_actions([("/orders", handler)], tmp_path, 2)
+    assert [x.context["from_cache"] for x in actions] == [False, False]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    process_response_to_json,
+)
+from utility_lib.async_utilities.http_limits import (
+    HostRateLimiter,
+    TokenBucket,
+    parse_retry_after,
+    url_host,
+)
+
+
+def test_url_host():
+    assert url_host("https://esi.evetech.net/v1/markets/") == "esi.evetech.net"
+    assert url_host("http://127.0.0.1:8080/data?page=2") == "127.0.0.1:8080"
+
+
+def test_parse_retry_after():
+    now = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("12") == 12
+    assert parse_retry_after("not a date") is None
+    http_date = format_datetime(now + timedelta(seconds=30), usegmt=True)
+    assert parse_retry_after(http_date, now=now) == 30
+    assert parse_retry_after(format_datetime(now, usegmt=True), now=now) == 0
+
+
+def test_token_bucket_paces_requests():
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(11)])
+        return time.monotonic() - start
+
+    # first token is free, the other 10 refill at 50 per second.
+    assert asyncio.run(run()) >= 0.19
+
+
+def test_token_bucket_pause():
+    async def run():
+        bucket = TokenBucket(rate=1000)
+        bucket.pause_for(0.2)
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.19
+
+
+def test_http_runner_honors_error_limit_headers():
+    request_times = []
+
+    async def handler(request):
+        request_times.append(time.monotonic())
+        if len(request_times) == 1:
+            return web.Response(
+                status=420,
+                headers={
+                    "X-Esi-Error-Limit-Remain": "0",
+                    "X-Esi-Error-Limit-Reset": "1",
+                },
+            )
+        return web.json_response({"ok": True})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/data", handler)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            action = HttpAction(
+                "GET",
+                str(server.make_url("/data")),
+                response_handlers=[process_response_to_json],
+            )
+            runner = HttpQueueRunner(rate_limiter=HostRateLimiter(100))
+            await runner.do_queue([action], 2)
+        finally:
+            await server.close()
+        return action
+
+    action = asyncio.run(run())
+    assert action.context["response_data"] == {"ok": True}
+    assert len(request_times) == 2
+    assert request_times[1] - request_times[0] >= 0.9
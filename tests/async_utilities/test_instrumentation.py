@@ -0,0 +1,86 @@
+import asyncio
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    QueueAction,
+    QueueRunner,
+)
+from utility_lib.async_utilities.instrumentation import (
+    LatencyHistogram,
+    MetricsCollector,
+)
+from utility_lib.async_utilities.retry import RetryPolicy
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    for latency_ns in range(1, 1001):
+        histogram.record(latency_ns * 1000)
+    assert histogram.count == 1000
+    assert histogram.mean() == 500500
+    # within half a bucket, about 4.5%.
+    assert abs(histogram.percentile(50) - 500_000) < 500_000 * 0.05
+    assert abs(histogram.percentile(99) - 990_000) < 990_000 * 0.05
+    assert histogram.percentile(100) == 1_000_000
+    assert histogram.percentile(0) == 1000
+
+
+class SleepAction(QueueAction):
+    async def do_action(self, queue):
+        await asyncio.sleep(self.context["delay"])
+
+
+def test_metrics_collector_basic_runner():
+    metrics = MetricsCollector()
+    actions = [SleepAction(str(x), context={"delay": 0.01}) for x in range(20)]
+    runner = QueueRunner(instruments=[metrics])
+    asyncio.run(runner.do_queue(actions, 4))
+    summary = metrics.summary()
+    assert summary["started"] == 20
+    assert summary["succeeded"] == 20
+    assert summary["failed"] == 0
+    assert 0.009 < summary["latency_p50"] < 0.05
+    assert summary["requests_per_second"] > 0
+    assert 0 < summary["worker_utilisation"] <= 1
+    assert len(metrics.report_lines()) == len(summary)
+
+
+def test_metrics_collector_http_runner():
+    calls = []
+    body = b"x" * 1000
+
+    async def flaky(request):
+        calls.append(1)
+        if len(calls) == 1:
+            return web.Response(status=503)
+        return web.Response(body=body)
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/flaky", flaky)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            actions = [
+                HttpAction("GET", str(server.make_url(path)))
+                for path in ("/flaky", "/missing")
+            ]
+            runner = HttpQueueRunner(
+                retry_policy=RetryPolicy(base_delay=0.01), instruments=[metrics]
+            )
+            await runner.do_queue(actions, 2)
+        finally:
+            await server.close()
+
+    metrics = MetricsCollector()
+    asyncio.run(run())
+    summary = metrics.summary()
+    assert summary["started"] == 3
+    assert summary["retries"] == 1
+    assert summary["succeeded"] == 1
+    assert summary["failed"] == 1
+    assert summary["bytes_received"] >= len(body)
@@ -0,0 +1,120 @@
+import asyncio
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    OutcomeStatus,
+    QueueAction,
+    QueueRunner,
+    check_for_pages,
+)
+from utility_lib.async_utilities.journal import DONE, PENDING, RunJournal
+
+RUNS = []
+
+
+class RecordingAction(QueueAction):
+    async def do_action(self, queue):
+        await asyncio.sleep(0.001)
+        RUNS.append(self.name)
+        if self.context.get("fail"):
+            raise ValueError(self.name)
+
+
+def make_actions():
+    return [RecordingAction(str(x), {"fail": x == 9}) for x in range(10)]
+
+
+async def run_until(runner, actions, outcome_count):
+    finished = []
+    outcomes = runner.iter_queue(actions, 1)
+    try:
+        async for outcome in outcomes:
+            finished.append(outcome.action)
+            if len(finished) == outcome_count:
+                break
+    finally:
+        await outcomes.aclose()
+    return finished
+
+
+def test_journal_skips_finished_actions(tmp_path):
+    del RUNS[:]
+    with RunJournal(tmp_path / "job.sqlite", commit_every=2) as journal:
+        finished = asyncio.run(
+            run_until(QueueRunner(journal=journal), make_actions(), 3)
+        )
+        finished = [x.name for x in finished]
+        assert len(finished) == 3
+        assert journal.statuses(DONE) == {f"RecordingAction:{x}" for x in finished}
+        assert len(journal.statuses(PENDING)) == 7
+
+    first_runs = list(RUNS)
+    del RUNS[:]
+    with RunJournal(tmp_path / "job.sqlite") as journal:
+        outcomes = asyncio.run(QueueRunner(journal=journal).do_queue(make_actions(), 2))
+    # pending actions are restored from the journal, not fed twice.
+    assert sorted(RUNS) == sorted(set(RUNS))
+    assert not set(finished) & set(RUNS)
+    assert set(first_runs) | set(RUNS) == {str(x) for x in range(10)}
+    assert [x.status for x in outcomes if x.action.name == "9"] == [
+        OutcomeStatus.FAILED
+    ]
+
+    # failed actions only run again with retry_failed.
+    del RUNS[:]
+    with RunJournal(tmp_path / "job.sqlite") as journal:
+        asyncio.run(QueueRunner(journal=journal).do_queue(make_actions(), 2))
+    assert RUNS == []
+    with RunJournal(tmp_path / "job.sqlite", retry_failed=True) as journal:
+        asyncio.run(QueueRunner(journal=journal).do_queue(make_actions(), 2))
+    assert RUNS == ["9"]
+
+
+def test_journal_runs_duplicate_keys_in_source(tmp_path):
+    del RUNS[:]
+    actions = [RecordingAction("job", {"n": 1}), RecordingAction("job", {"n": 2})]
+    with RunJournal(tmp_path / "job.sqlite") as journal:
+        outcomes = asyncio.run(QueueRunner(journal=journal).do_queue(actions, 2))
+    assert len(outcomes) == 2
+    assert RUNS == ["job", "job"]
+
+
+def test_journal_resumes_extra_pages(tmp_path):
+    requests = []
+    # the journal keys requests by url, so both runs use the same port.
+    port = test_utils.unused_port()
+
+    async def handler(request):
+        requests.append(int(request.query["page"]))
+        return web.json_response([], headers={"x-pages": "5"})
+
+    async def run(first_run):
+        app = web.Application()
+        app.router.add_get("/orders", handler)
+        server = test_utils.TestServer(app, port=port)
+        await server.start_server()
+        try:
+            action = HttpAction(
+                "GET",
+                str(server.make_url("/orders")),
+                request_params={"page": 1},
+                response_handlers=[check_for_pages],
+            )
+            with RunJournal(tmp_path / "crawl.sqlite") as journal:
+                runner = HttpQueueRunner(journal=journal)
+                if first_run:
+                    return await run_until(runner, [action], 1)
+                return await runner.do_queue([action], 2)
+        finally:
+            await server.close()
+
+    asyncio.run(run(True))
+    first_requests = list(requests)
+    del requests[:]
+    asyncio.run(run(False))
+    assert first_requests[0] == 1
+    assert 1 not in requests
+    assert set(first_requests) | set(requests) == {1, 2, 3, 4, 5}
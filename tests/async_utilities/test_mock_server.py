@@ -0,0 +1,83 @@
+import asyncio
+
+import aiohttp
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    check_for_pages,
+    store_page_text,
+)
+from utility_lib.async_utilities.benchmark import format_results, run_benchmarks
+from utility_lib.async_utilities.mock_server import MockApi, MockApiConfig
+
+
+def get_statuses(api, params_list):
+    async def run():
+        statuses = []
+        async with api.serve() as url, aiohttp.ClientSession() as session:
+            for params in params_list:
+                async with session.get(url, params=params) as response:
+                    await response.read()
+                    statuses.append(
+                        (
+                            response.status,
+                            response.headers.get("x-pages"),
+                            response.headers["X-Esi-Error-Limit-Remain"],
+                        )
+                    )
+        return statuses
+
+    return asyncio.run(run())
+
+
+def test_mock_api_pages():
+    api = MockApi(MockApiConfig(pages=3, items_per_page=5))
+
+    async def run():
+        async with api.serve() as url:
+            action = HttpAction(
+                "GET",
+                url,
+                request_params={"page": 1},
+                response_handlers=[check_for_pages, store_page_text],
+                context={"pages": {}},
+            )
+            await HttpQueueRunner().do_queue([action], 3)
+        return action
+
+    action = asyncio.run(run())
+    assert sorted(action.context["pages"]) == ["1", "2", "3"]
+    assert api.requests == 3
+    assert api.statuses == {200: 3}
+
+
+def test_mock_api_errors():
+    api = MockApi(MockApiConfig(pages=2, error_limit=2))
+    statuses = get_statuses(api, [{"page": 1}, {"page": 3}, {"page": "x"}, {}])
+    assert statuses == [
+        (200, "2", "2"),
+        (404, None, "1"),
+        (400, None, "0"),
+        # error limited until the window resets.
+        (420, None, "0"),
+    ]
+    api = MockApi(MockApiConfig(error_rate=1.0, error_statuses=(503,), seed=1))
+    assert [x[0] for x in get_statuses(api, [{}, {}])] == [503, 503]
+    assert api.errors == 2
+
+
+def test_benchmark(capsys):
+    config = MockApiConfig(pages=4, items_per_page=10, error_rate=0.1, seed=3)
+    results = run_benchmarks([1, 4], 40, config, trace_memory=True)
+    assert [x["workers"] for x in results] == [1, 4]
+    for result in results:
+        assert result["succeeded"] == 40
+        assert result["retries"] > 0
+        assert result["requests_per_second"] > 0
+        assert result["peak_traced_kb"] > 0
+    # retried errors are counted, not printed.
+    assert capsys.readouterr().out == ""
+    lines = format_results(results)
+    assert len(lines) == 3
+    assert lines[0].split()[:2] == ["workers", "req/s"]
@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from utility_lib.async_utilities.async_queue import (
+    ExampleAction,
+    OutcomeStatus,
+    PoolAction,
+    PoolQueueRunner,
+    QueueRunner,
+)
+
+
+class HashAction(PoolAction):
+    @staticmethod
+    def compute(data):
+        digest = data
+        for _ in range(1000):
+            digest = hashlib.sha256(digest).digest()
+        return os.getpid(), digest.hex()
+
+
+class FailingAction(PoolAction):
+    @staticmethod
+    def compute(data):
+        raise ValueError(data)
+
+
+def make_actions(count):
+    return [
+        HashAction(str(x), context={"data": str(x).encode("utf8")})
+        for x in range(count)
+    ]
+
+
+def test_pool_runner_runs_compute_in_processes():
+    actions = make_actions(20)
+    runner = PoolQueueRunner(pool_size=2)
+    outcomes = asyncio.run(runner.do_queue(actions + [ExampleAction("io")], 4))
+    assert all(x.status is OutcomeStatus.SUCCESS for x in outcomes)
+    pids = {x.context["result"][0] for x in actions}
+    assert os.getpid() not in pids
+    assert len(pids) <= 2
+    expected = make_actions(20)
+    asyncio.run(QueueRunner().do_queue(expected, 4))
+    assert [x.context["result"][1] for x in actions] == [
+        x.context["result"][1] for x in expected
+    ]
+
+
+def test_pool_runner_threads_and_errors():
+    actions = make_actions(5) + [FailingAction("bad", context={"data": "bad"})]
+    runner = PoolQueueRunner(pool_size=2, use_processes=False)
+    outcomes = asyncio.run(runner.do_queue(actions, 2))
+    outcomes.sort(key=lambda x: x.action.name)
+    assert [x.status for x in outcomes] == [OutcomeStatus.SUCCESS] * 5 + [
+        OutcomeStatus.FAILED
+    ]
+    assert isinstance(outcomes[-1].error, ValueError)
+    assert {x.context["result"][0] for x in actions[:5]} == {os.getpid()}
+
+
+def test_pool_action_needs_compute():
+    class NoComputeAction(PoolAction):
+        pass
+
+    with pytest.raises(TypeError):
+        NoComputeAction("no compute", context={"data": 1})
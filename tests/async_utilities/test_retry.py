@@ -0,0 +1,76 @@
+import asyncio
+import socket
+import time
+
+from aiohttp import test_utils, web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    process_response_to_json,
+)
+from utility_lib.async_utilities.retry import RetryPolicy
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(base_delay=1, multiplier=2, max_delay=5, jitter=0)
+    assert [policy.delay(x) for x in range(1, 6)] == [1, 2, 4, 5, 5]
+    jittered = RetryPolicy(base_delay=1, multiplier=2, max_delay=5, jitter=0.5)
+    for _ in range(100):
+        assert 2 <= jittered.delay(3) <= 4
+
+
+def test_retry_backs_off_without_blocking_worker():
+    events = []
+
+    async def flaky(request):
+        events.append(("flaky", time.monotonic()))
+        if len([x for x in events if x[0] == "flaky"]) < 3:
+            return web.Response(status=503)
+        return web.json_response({"ok": True})
+
+    async def steady(request):
+        events.append(("steady", time.monotonic()))
+        return web.json_response({"ok": True})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/flaky", flaky)
+        app.router.add_get("/steady", steady)
+        server = test_utils.TestServer(app)
+        await server.start_server()
+        try:
+            actions = [
+                HttpAction(
+                    "GET",
+                    str(server.make_url(path)),
+                    response_handlers=[process_response_to_json],
+                )
+                for path in ("/flaky", "/steady")
+            ]
+            runner = HttpQueueRunner(
+                retry_policy=RetryPolicy(base_delay=0.1, jitter=0)
+            )
+            await runner.do_queue(actions, 1)
+        finally:
+            await server.close()
+        return actions
+
+    actions = asyncio.run(run())
+    assert [x.context["response_data"] for x in actions] == [{"ok": True}] * 2
+    assert actions[0].retry_count == 3
+    # the single worker served /steady while /flaky was backing off.
+    assert [x[0] for x in events] == ["flaky", "steady", "flaky", "flaky"]
+    flaky_times = [x[1] for x in events if x[0] == "flaky"]
+    assert flaky_times[1] - flaky_times[0] >= 0.1
+    assert flaky_times[2] - flaky_times[1] >= 0.2
+
+
+def test_retry_connection_errors():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    action = HttpAction("GET", f"http://127.0.0.1:{port}/", retry_limit=3)
+    runner = HttpQueueRunner(retry_policy=RetryPolicy(base_delay=0.01))
+    asyncio.run(runner.do_queue([action], 2))
+    assert action.retry_count == 3
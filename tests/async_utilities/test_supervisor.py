@@ -0,0 +1,115 @@
+import asyncio
+import threading
+from concurrent.futures import as_completed
+from functools import partial
+
+from aiohttp import web
+
+from utility_lib.async_utilities.async_queue import (
+    HttpAction,
+    HttpQueueRunner,
+    QueueAction,
+    QueueRunner,
+    process_response_to_json,
+)
+from utility_lib.async_utilities.outcomes import OutcomeStatus
+from utility_lib.async_utilities.supervisor import LoopThread, RunnerSupervisor
+
+
+class ThreadNameAction(QueueAction):
+    async def do_action(self, queue):
+        await asyncio.sleep(0.01)
+        return threading.current_thread().name
+
+
+def thread_name_actions(count):
+    return [ThreadNameAction(str(n), context={"n": n}) for n in range(count)]
+
+
+def test_loop_thread():
+    loop_thread = LoopThread("test-loop")
+    loop_thread.start()
+
+    async def name():
+        return threading.current_thread().name
+
+    assert loop_thread.submit(name()).result(timeout=5) == "test-loop"
+    loop_thread.stop()
+    assert not loop_thread.thread.is_alive()
+    assert loop_thread.loop.is_closed()
+
+
+def test_supervisor_threads():
+    with RunnerSupervisor(QueueRunner, loops=2) as supervisor:
+        futures = [supervisor.submit(thread_name_actions(5), 2) for _ in range(4)]
+        threads = set()
+        for future in as_completed(futures, timeout=10):
+            outcomes = future.result()
+            assert [x.status for x in outcomes] == [OutcomeStatus.SUCCESS] * 5
+            threads.update(x.result for x in outcomes)
+    assert threads == {"RunnerSupervisor-0", "RunnerSupervisor-1"}
+    assert supervisor.lanes == []
+
+
+def test_supervisor_stop_and_cancel():
+    class LongAction(QueueAction):
+        async def do_action(self, queue):
+            await asyncio.sleep(10)
+
+    supervisor = RunnerSupervisor(QueueRunner, loops=1)
+    running = supervisor.submit([LongAction("a", context={"a": 1})], 1)
+    waiting = supervisor.submit([LongAction("b", context={"b": 1})], 1)
+    supervisor.shutdown(cancel_futures=True)
+    assert waiting.cancelled()
+    assert running.cancelled() or running.result(timeout=5) == []
+
+
+def test_supervisor_processes():
+    with RunnerSupervisor(QueueRunner, loops=2, use_processes=True) as supervisor:
+        futures = [supervisor.submit(thread_name_actions(3), 3) for _ in range(2)]
+        for future in futures:
+            outcomes = future.result(timeout=30)
+            assert [x.status for x in outcomes] == [OutcomeStatus.SUCCESS] * 3
+            assert {x.result for x in outcomes} == {"MainThread"}
+
+
+def test_supervisor_http_runners_reuse_sessions():
+    async def handler(request):
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_get("/ok", handler)
+    server_thread = LoopThread()
+    server_thread.start()
+    runner = web.AppRunner(app)
+
+    async def serve():
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner.addresses[0][1]
+
+    port = server_thread.submit(serve()).result(timeout=5)
+    url = f"http://127.0.0.1:{port}/ok"
+    try:
+        with RunnerSupervisor(partial(HttpQueueRunner, sessions=2)) as supervisor:
+            pools = [lane.runner.session_pool for lane in supervisor.lanes]
+            sessions = [session for pool in pools for session in pool.sessions]
+            assert len(sessions) == 4
+            for _ in range(2):
+                actions = [
+                    HttpAction(
+                        "GET",
+                        url,
+                        request_params={"n": n},
+                        response_handlers=[process_response_to_json],
+                    )
+                    for n in range(4)
+                ]
+                outcomes = supervisor.submit(actions, 2).result(timeout=10)
+                assert [x.status for x in outcomes] == [OutcomeStatus.SUCCESS] * 4
+            assert [lane.runner.session_pool for lane in supervisor.lanes] == pools
+        assert all(session.closed for session in sessions)
+    finally:
+        server_thread.submit(runner.cleanup()).result(timeout=5)
+        server_thread.stop()
@@ -0,0 +1,79 @@
+import io
+from array import array
+from pathlib import Path
+
+import pytest
+
+from utility_lib.file_utilities import csv_columns
+from utility_lib.file_utilities.csv_columns import (
+    read_column_batches,
+    read_columns,
+)
+from utility_lib.file_utilities.csv_utililities import read_records_from_file
+from utility_lib.file_utilities.eve_market_orders import MarketOrderRecordReader
+
+SAMPLE_CSV = Path(__file__).parent / "test_data/market_orders_10000033.49_of_49.csv"
+
+SCHEMA = {
+    "type_id": "int",
+    "is_buy_order": "bool",
+    "price": "float",
+    "range": "str",
+    "volume_remain": "int",
+}
+
+
+def open_sample():
+    return SAMPLE_CSV.open("r", encoding="utf8", newline="")
+
+
+def test_read_columns():
+    orders = read_records_from_file(SAMPLE_CSV, MarketOrderRecordReader())
+    with open_sample() as file_in:
+        columns = read_columns(file_in, SCHEMA, use_numpy=False)
+    assert list(columns) == list(SCHEMA)
+    assert columns["type_id"] == array("q", [x.type_id for x in orders])
+    assert columns["is_buy_order"] == array("b", [x.is_buy_order for x in orders])
+    assert columns["price"] == array("d", [x.price for x in orders])
+    assert columns["range"] == [x.range_ for x in orders]
+    assert sum(columns["volume_remain"]) == sum(x.volume_remain for x in orders)
+
+
+def test_read_column_batches():
+    with open_sample() as file_in:
+        batches = list(
+            read_column_batches(file_in, SCHEMA, batch_size=150, use_numpy=False)
+        )
+    assert [len(x["price"]) for x in batches] == [150, 150, 100]
+    with open_sample() as file_in:
+        columns = read_columns(file_in, SCHEMA, use_numpy=False)
+    assert sum((x["price"] for x in batches), array("d")) == columns["price"]
+
+
+def test_read_columns_bad_schema():
+    with pytest.raises(ValueError):
+        read_columns(io.StringIO("a,b\n1,2\n"), {"c": "int"})
+    with pytest.raises(ValueError):
+        read_columns(io.StringIO("a,b\n1,2\n"), {"a": "decimal"})
+
+
+def test_read_columns_headers_only():
+    columns = read_columns(io.StringIO("a,b\n"), {"a": "int", "b": "str"}, False)
+    assert columns == {"a": array("q"), "b": []}
+
+
+def test_read_columns_numpy():
+    numpy = pytest.importorskip("numpy")
+    with open_sample() as file_in:
+        columns = read_columns(file_in, SCHEMA, use_numpy=True)
+    with open_sample() as file_in:
+        expected = read_columns(file_in, SCHEMA, use_numpy=False)
+    assert columns["price"].dtype == numpy.float64
+    assert columns["price"].sum() == pytest.approx(sum(expected["price"]))
+
+
+def test_read_columns_numpy_missing(monkeypatch):
+    monkeypatch.setattr(csv_columns, "numpy", None)
+    with pytest.raises(ImportError):
+        read_columns(io.StringIO("a\n1\n"), {"a": "int"}, use_numpy=True)
+    assert read_columns(io.StringIO("a\n1\n"), {"a": "int"}) == {"a": array("q", [1])}
@@ -0,0 +1,79 @@
+import csv
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from utility_lib.file_utilities.csv_parallel import (
+    chunk_boundaries,
+    read_chunks_parallel,
+    read_records_parallel,
+)
+from utility_lib.file_utilities.csv_utililities import (
+    TupleRecordReader,
+    read_records_from_file,
+)
+from utility_lib.file_utilities.eve_market_orders import MarketOrderSchemaReader
+
+SAMPLE_CSV = Path(__file__).parent / "test_data/market_orders_10000033.49_of_49.csv"
+
+
+@pytest.fixture
+def quoted_csv(tmp_path):
+    rows = [("name", "note", "count")]
+    for number in range(50):
+        rows.append(
+            (f"row {number}", f'line one\nline "two"\n,{number}\n', str(number))
+        )
+    path = tmp_path / "quoted.csv"
+    with path.open("w", encoding="utf8", newline="") as file_out:
+        csv.writer(file_out).writerows(rows)
+    return path, [tuple(x) for x in rows[1:]]
+
+
+def test_chunk_boundaries(quoted_csv):
+    path, rows = quoted_csv
+    size = path.stat().st_size
+    for chunk_size in (1, 7, 64, size):
+        chunks = chunk_boundaries(path, chunk_size)
+        assert chunks[-1][1] == size
+        assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+        with path.open("rb") as file_in:
+            data = file_in.read()
+        records = []
+        for start, end in chunks:
+            text = data[start:end].decode("utf8")
+            records.extend(tuple(x) for x in csv.reader(text.splitlines(True)))
+        assert records == rows
+    assert len(chunk_boundaries(path, 1)) == len(rows)
+
+
+def test_read_records_parallel_quoted(quoted_csv):
+    path, rows = quoted_csv
+    with ThreadPoolExecutor(2) as executor:
+        records = list(
+            read_records_parallel(
+                path, TupleRecordReader, chunk_size=100, executor=executor
+            )
+        )
+    assert records == rows
+
+
+def test_read_records_parallel_processes():
+    expected = read_records_from_file(SAMPLE_CSV, MarketOrderSchemaReader())
+    records = list(
+        read_records_parallel(
+            SAMPLE_CSV, MarketOrderSchemaReader, workers=2, chunk_size=4096
+        )
+    )
+    assert records == expected
+    chunks = list(
+        read_chunks_parallel(
+            SAMPLE_CSV, TupleRecordReader, workers=2, chunk_size=4096, ordered=False
+        )
+    )
+    assert len(chunks) > 2
+    assert Counter(x for chunk in chunks for x in chunk) == Counter(
+        read_records_from_file(SAMPLE_CSV, TupleRecordReader())
+    )
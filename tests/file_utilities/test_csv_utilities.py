@@ -11,8 +11,12 @@ from utility_lib.file_utilities.csv_utililities import (
     RecordReader,
     RecordWriter,
     RemappedHeader,
+    SchemaField,
+    SchemaRecordReader,
     TupleRecordReader,
     TupleRecordWriter,
+    iter_records_from_file,
+    open_records,
     read_records_from_file,
     write_list_to_csv,
     write_record_to_csv,
@@ -20,8 +24,10 @@ from utility_lib.file_utilities.csv_utililities import (
 from utility_lib.file_utilities.eve_market_orders import (
     MarketOrderRecordReader,
     MarketOrderRecordWriter,
+    MarketOrderSchemaReader,
     make_remapped_headers,
 )
+from utility_lib.file_utilities.record_benchmark import run_benchmarks
 
 pp = PrettyPrinter(width=180)
 
@@ -76,6 +82,85 @@ def test_read_write_MarketOrder_data(csv_test_data):
     assert original_data == market_order_data
 
 
+def test_iter_records_from_file(csv_test_data):
+    path = csv_test_data["sample_csv_path"]
+    expected = read_records_from_file(path, MarketOrderRecordReader())
+    records = iter_records_from_file(path, MarketOrderRecordReader())
+    assert next(records) == expected[0]
+    assert list(records) == expected[1:]
+
+
+def test_open_records(csv_test_data):
+    path = csv_test_data["sample_csv_path"]
+    with open_records(path, TupleRecordReader()) as records:
+        first = next(records)
+    # closing the generator left its `with` block, closing the file.
+    assert records.gi_frame is None
+    assert list(records) == []
+    assert first == read_records_from_file(path, TupleRecordReader())[0]
+
+
+def test_read_MarketOrder_schema(csv_test_data):
+    path = csv_test_data["sample_csv_path"]
+    expected = read_records_from_file(path, MarketOrderRecordReader())
+    assert read_records_from_file(path, MarketOrderSchemaReader()) == expected
+
+    # columns are found by header, so their order doesn't matter.
+    lines = path.read_text(encoding="utf8").splitlines()
+    reordered_path = csv_test_data["output_root_dir"] / "reordered.csv"
+    reordered_path.write_text(
+        "\n".join(",".join(reversed(x.split(","))) for x in lines), encoding="utf8"
+    )
+    assert read_records_from_file(reordered_path, MarketOrderSchemaReader()) == (
+        expected
+    )
+
+
+def test_read_MarketOrder_schema_remapped(csv_test_data):
+    path = csv_test_data["sample_csv_path"]
+    expected = read_records_from_file(path, MarketOrderRecordReader())
+    record_reader = MarketOrderSchemaReader(remapped_headers=make_remapped_headers())
+    assert read_records_from_file(path, record_reader) == expected
+    assert "range_" in record_reader.headers()
+
+    # without a header row, columns are found by the remapped file headers.
+    headerless_path = csv_test_data["output_root_dir"] / "headerless.csv"
+    lines = path.read_text(encoding="utf8").splitlines(True)
+    headerless_path.write_text("".join(lines[1:]), encoding="utf8")
+    record_reader = MarketOrderSchemaReader(
+        read_headers_in_first_row=False, remapped_headers=make_remapped_headers()
+    )
+    assert read_records_from_file(headerless_path, record_reader) == expected
+
+
+def test_schema_record_reader(csv_test_data):
+    schema = [
+        SchemaField("order", "order_id", int),
+        SchemaField("price", converter=float),
+        SchemaField("range", 7),
+    ]
+    record_reader = SchemaRecordReader(dict, schema)
+    records = read_records_from_file(csv_test_data["sample_csv_path"], record_reader)
+    assert records[0] == {"order": 5554953115, "price": 1.0, "range": "region"}
+
+    with pytest.raises(ValueError):
+        read_records_from_file(
+            csv_test_data["sample_csv_path"],
+            SchemaRecordReader(dict, [SchemaField("missing")]),
+        )
+
+
+def test_record_benchmark():
+    results = run_benchmarks(20, repeat=1)
+    assert [x["reader"] for x in results] == [
+        "tuple",
+        "dict",
+        "market_order",
+        "market_order_schema",
+    ]
+    assert all(x["rows_per_second"] > 0 for x in results)
+
+
 def test_read_dict_data(csv_test_data):
     record_reader = DictRecordReader()
     data = read_records_from_file(csv_test_data["sample_csv_path"], record_reader)
@@ -0,0 +1,67 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from utility_lib.file_utilities.csv_utililities import (
+    DictRecordReader,
+    dict_factory,
+    read_csv_to_row_factory,
+    read_records_from_file,
+)
+from utility_lib.file_utilities.mapped_file import MappedTextFile
+
+SAMPLE_CSV = Path(__file__).parent / "test_data/market_orders_10000033.49_of_49.csv"
+
+
+def file_lines(path):
+    with path.open("r", encoding="utf8", newline="") as file_in:
+        return list(file_in)
+
+
+@pytest.fixture
+def awkward_csv(tmp_path):
+    path = tmp_path / "awkward.csv"
+    with path.open("w", encoding="utf8", newline="") as file_out:
+        writer = csv.writer(file_out)
+        writer.writerow(["name", "note"])
+        for number in range(40):
+            writer.writerow([f"Ström {number}", "x" * number + '\nquoted "line"'])
+    return path
+
+
+@pytest.mark.parametrize("block_size", [1, 10, 1024 * 1024])
+def test_mapped_lines(awkward_csv, block_size):
+    with MappedTextFile(awkward_csv, block_size=block_size) as mapped:
+        assert list(mapped.lines()) == file_lines(awkward_csv)
+        # scans again from the start.
+        assert list(csv.reader(mapped)) == list(csv.reader(file_lines(awkward_csv)))
+
+
+def test_mapped_lines_other_line_breaks(tmp_path):
+    path = tmp_path / "breaks.csv"
+    path.write_text("a,b\x1cc\r\nd\u2028e,f\rg,\"h\ni\"\n", encoding="utf8")
+    with MappedTextFile(path, block_size=4) as mapped:
+        assert list(mapped.lines()) == file_lines(path)
+        assert list(csv.reader(mapped)) == list(csv.reader(file_lines(path)))
+
+
+def test_mapped_empty_file(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_bytes(b"")
+    with MappedTextFile(path) as mapped:
+        assert list(mapped.lines()) == []
+
+
+def test_mapped_file_not_open():
+    with pytest.raises(ValueError):
+        list(MappedTextFile(SAMPLE_CSV).lines())
+
+
+def test_read_records_with_mmap():
+    expected = read_records_from_file(SAMPLE_CSV, DictRecordReader())
+    assert read_records_from_file(SAMPLE_CSV, DictRecordReader(), use_mmap=True) == (
+        expected
+    )
+    with MappedTextFile(SAMPLE_CSV) as mapped:
+        assert list(read_csv_to_row_factory(mapped.lines(), dict_factory)) == expected